@@ -0,0 +1,255 @@
+"""
+Soldier animations: a small state machine per character, with each state's
+frames loaded the first time it is shown.
+
+Every soldier (images/Soldier_1 to Soldier_3) has a sheet per state: Idle,
+Walk, Run, Shot_1, Attack, Dead and so on. How a state plays (its Timeline:
+ticks per frame and what happens at the end) is shared by every soldier;
+only the number of frames differs, and that is read from the sheet's PNG
+header without decoding it.
+
+The frames themselves come from one AnimationCache shared by every animator.
+Scaled and mirrored, a full set of states is tens of megabytes per soldier,
+so the cache keeps only a budget's worth, dropping the least recently
+entered states first. Sheets already in the assets caches (e.g. requested
+through the AssetLoader at startup) are used from there instead.
+
+    animator = Animator('Soldier_2')
+    animator.set_base('Walk' if moving else 'Idle', tick)
+    animator.play('Shot_1', tick)  # One-shot: back to the base state when it ends
+    image = animator.frame(tick, facing_left)
+
+    python bench.py --animations  # eager vs lazy loading, and resident memory under the budget
+"""
+import struct
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+import assets
+
+SOLDIERS = ('Soldier_1', 'Soldier_2', 'Soldier_3')
+FRAME_SIZE = 128  # Width and height of a frame in every soldier sheet
+SCALE = 2  # Soldiers are drawn at twice their sheets' size
+
+# What a state does after its last frame
+LOOP = 'loop'  # Starts over
+RETURN = 'return'  # Goes back to the base state (see Animator.set_base)
+HOLD = 'hold'  # Stays on the last frame for good
+
+
+class Timeline(namedtuple('Timeline', ['ticks_per_frame', 'ending'])):
+    """
+    How a state plays, whichever soldier plays it.
+    """
+    __slots__ = ()
+
+    def frame(self, ticks, num_frames):
+        """
+        Return (frame index, whether it has ended) ticks after the state was entered.
+        """
+        index = ticks // self.ticks_per_frame
+        if self.ending == LOOP:
+            return index % num_frames, False
+        return min(index, num_frames - 1), index >= num_frames
+
+
+TIMELINES = {
+    'Idle': Timeline(6, LOOP),
+    'Walk': Timeline(4, LOOP),
+    'Run': Timeline(3, LOOP),
+    'Shot_1': Timeline(2, RETURN),
+    'Shot_2': Timeline(2, RETURN),
+    'Attack': Timeline(3, RETURN),
+    'Recharge': Timeline(3, RETURN),
+    'Grenade': Timeline(3, RETURN),
+    'Hurt': Timeline(3, RETURN),
+    'Dead': Timeline(6, HOLD),
+}
+
+# Sheets not named after their state
+FILE_NAMES = {
+    ('Soldier_3', 'Attack'): 'Attacck.png',  # Misspelt in the asset pack
+}
+
+
+def sheet_path(variant, state):
+    return f"images/{variant}/{FILE_NAMES.get((variant, state), state + '.png')}"
+
+
+@lru_cache(maxsize=None)
+def png_size(path):
+    """
+    Read the width and height of a PNG from its header, without decoding it.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+        raise ValueError(f"{path} is not a PNG")
+    return struct.unpack('>II', header[16:24])
+
+
+def soldier_entry(variant, state):
+    """
+    Return the sheet of a soldier's state as an asset manifest entry (see atlas.MANIFEST),
+    e.g. for requesting it from the AssetLoader.
+    A sheet that is missing or not a PNG gets one frame, which loads as a placeholder.
+    """
+    if state not in TIMELINES:
+        raise ValueError(f"unknown animation state {state!r}")
+    path = sheet_path(variant, state)
+    try:
+        num_frames = max(png_size(path)[0] // FRAME_SIZE, 1)
+    except (OSError, ValueError):
+        num_frames = 1
+    return {'kind': 'sheet', 'path': path, 'frame_width': FRAME_SIZE, 'frame_height': FRAME_SIZE,
+            'num_frames': num_frames, 'scale_factor': SCALE}
+
+
+def sheet_bytes(sheet):
+    """
+    Return the pixel memory of a sheet's frames and their mirrored copies.
+    """
+    return sum(frame.get_width() * frame.get_height() * frame.get_bytesize() for frame in sheet.frames + sheet.flipped)
+
+
+AGE_EVERY = 256  # State entries between halvings of the use counts
+
+
+class AnimationCache:
+    """
+    Frames of soldier states, loaded on first use and shared by every animator.
+    Beyond budget bytes, the states entered least often are dropped (the least
+    recently entered of those first); one that is needed again is simply loaded
+    again. Every AGE_EVERY entries all counts are halved, so states that stop
+    being used make way in time. An animator keeps the frames of the state it is playing, so
+    dropping never pulls frames from under it.
+    """
+    def __init__(self, budget=32 * 1024 * 1024):
+        """
+        Args:
+            budget (int): Bytes of frames to keep, not counting sheets the assets caches hold (default is 32 MiB).
+        """
+        if budget < 0:
+            raise ValueError("budget must not be negative")
+        self.budget = budget
+        self.sheets = OrderedDict()  # (variant, state) -> Sheet, least recently entered first
+        self.sizes = {}  # (variant, state) -> bytes
+        self.uses = {}  # (variant, state) -> times entered, halved every AGE_EVERY entries
+        self.entries = 0
+        self.resident = 0  # Bytes of the sheets held
+        self.peak = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.sheets)
+
+    def get(self, variant, state):
+        """
+        Return the Sheet of a soldier's state, loading it if it isn't held.
+        """
+        key = (variant, state)
+        self.entries += 1
+        if self.entries % AGE_EVERY == 0:
+            for held in self.uses:
+                self.uses[held] //= 2
+        sheet = self.sheets.get(key)
+        if sheet is not None:
+            self.hits += 1
+            self.uses[key] += 1
+            self.sheets.move_to_end(key)
+            return sheet
+
+        entry = soldier_entry(variant, state)
+        sheet = assets.cached_sheet(entry['path'], FRAME_SIZE, FRAME_SIZE, entry['num_frames'], SCALE)
+        if sheet is not None:
+            self.hits += 1  # Held by the assets caches for good; nothing to budget
+            return sheet
+
+        self.loads += 1
+        sheet = assets.decode_sheet(entry['path'], FRAME_SIZE, FRAME_SIZE, entry['num_frames'], SCALE)
+        self.sizes[key] = sheet_bytes(sheet)
+        self.resident += self.sizes[key]
+        while self.resident > self.budget and self.sheets:
+            dropped = min(self.sheets, key=self.uses.get)  # Least used, least recent first on a tie
+            del self.sheets[dropped]
+            del self.uses[dropped]
+            self.resident -= self.sizes.pop(dropped)
+            self.evictions += 1
+        self.sheets[key] = sheet
+        self.uses[key] = 1
+        self.peak = max(self.peak, self.resident)
+        return sheet
+
+    def surfaces(self):
+        """
+        Count the surfaces held.
+        """
+        return sum(len(sheet.frames) + len(sheet.flipped) for sheet in self.sheets.values())
+
+    def stats(self):
+        return (f"{self.hits} hits / {self.loads} loads / {self.evictions} evictions, "
+                f"{self.resident / 2 ** 20:.1f} MiB held ({self.peak / 2 ** 20:.1f} MiB at peak)")
+
+
+class Animator:
+    """
+    Animation state machine of one soldier.
+    It is always in a state. The base state (Idle, Walk or Run: whatever the soldier
+    does when nothing else is going on) loops; play() interrupts it with a one-shot
+    state, after which it goes back to the base state, or holds, for Dead, for good.
+    Ticks are whatever clock the owner counts updates with.
+    """
+    def __init__(self, variant='Soldier_1', state='Idle', tick=0, cache=None):
+        """
+        Args:
+            variant (str): Soldier folder under images (default is 'Soldier_1').
+            state (str): Base state to start in (default is 'Idle').
+            tick (int): Tick it starts at (default is 0).
+            cache (AnimationCache): Where frames come from (default is the shared soldier_animations).
+        """
+        self.variant = variant
+        self.cache = soldier_animations if cache is None else cache
+        self.base = state
+        self._enter(state, tick)
+
+    def _enter(self, state, tick):
+        self.state = state
+        self.timeline = TIMELINES[state]
+        self.sheet = self.cache.get(self.variant, state)
+        self.start_tick = tick
+
+    def set_base(self, state, tick):
+        """
+        Set the looping state to be in when no one-shot state is playing, switching now if none is.
+        """
+        if state == self.base:
+            return
+        self.base = state
+        if self.timeline.ending == LOOP:
+            self._enter(state, tick)
+
+    def play(self, state, tick):
+        """
+        Play a one-shot state from its first frame (e.g. Shot_1 on firing), unless the soldier is dead.
+        """
+        if self.timeline.ending != HOLD:
+            self._enter(state, tick)
+
+    def frame(self, tick, facing_left=False):
+        """
+        Return the image to show at a tick, moving on to the base state if a one-shot state has ended.
+        Args:
+            tick (int): Current tick, no earlier than the last state change.
+            facing_left (bool): Mirror the image; the sheets face right (default is False).
+        """
+        index, ended = self.timeline.frame(tick - self.start_tick, len(self.sheet.frames))
+        if ended and self.timeline.ending == RETURN:
+            self._enter(self.base, tick)
+            index = 0
+        return (self.sheet.flipped if facing_left else self.sheet.frames)[index]
+
+
+# Frames of every soldier on screen
+soldier_animations = AnimationCache()
@@ -0,0 +1,247 @@
+from collections import namedtuple
+
+import pygame
+
+# Frames of a sprite sheet as drawn, and the same frames mirrored horizontally
+Sheet = namedtuple('Sheet', ['frames', 'flipped'])
+
+# Process-wide caches, keyed by everything that changes the resulting surfaces
+_sheets = {}
+_sequences = {}
+_images = {}
+_sprites = {}
+
+
+def sheet_key(image_path, frame_width, frame_height, num_frames, scale_factor=2):
+    return (image_path, frame_width, frame_height, num_frames, scale_factor)
+
+
+def sequence_key(image_path, num_frames, scale_factor=1):
+    return (image_path, num_frames, scale_factor)
+
+
+def image_key(image_path, size=None):
+    return (image_path, tuple(size) if size else None)
+
+
+def sprite_key(image_path, scale_factor=1):
+    return (image_path, scale_factor)
+
+
+def sequence_paths(image_path, num_frames):
+    """
+    Return the file names of a numbered frame folder (<image_path>/Explosion_1.png ...).
+    """
+    return [f"{image_path}/Explosion_{i}.png" for i in range(1, num_frames + 1)]
+
+
+def read_image(image_path):
+    """
+    Read an image file into a surface, without converting it to the display format.
+    Safe to call from a worker thread.
+    """
+    return pygame.image.load(image_path)
+
+
+def placeholder(size):
+    """
+    Make a magenta and black checkerboard to draw in place of an image that could not be loaded.
+    """
+    surface = pygame.Surface(size).convert()
+    surface.fill((255, 0, 255))
+    square = 8
+    for y in range(0, size[1], square):
+        for x in range((y // square) % 2 * square, size[0], square * 2):
+            surface.fill((0, 0, 0), (x, y, square, square))
+    return surface
+
+
+def _read_or_placeholder(image_path, image, size):
+    """
+    Return the image already read, or read it now. A file that is missing or can't be
+    decoded is replaced with a placeholder of size, so the game keeps going without it.
+    """
+    if image is not None:
+        return image
+    try:
+        return read_image(image_path)
+    except (pygame.error, OSError):
+        print(f"Error loading image: {image_path}")
+        return placeholder(size)
+
+
+def decode_sheet(image_path, frame_width, frame_height, num_frames, scale_factor=2, image=None):
+    """
+    Chop a sprite sheet into scaled frames and mirror them, without caching.
+    A sheet that can't be loaded is replaced with placeholder frames.
+    Args:
+        image (pygame.Surface): The sheet already read with read_image (default is to read it now).
+    Returns:
+        Sheet of the frames and their mirrored copies.
+    """
+    sprite_sheet = _read_or_placeholder(image_path, image, (frame_width * num_frames, frame_height)).convert_alpha()
+
+    frames = []
+    # Extract frames from sprite sheet
+    for i in range(num_frames):  # Assuming frames are arranged in a single row
+        x = i * frame_width
+        y = 0  # All frames are in the first row
+        frame = sprite_sheet.subsurface(pygame.Rect(x, y, frame_width, frame_height))
+
+        # Scale the frame (increase the size of the sprite)
+        frame = pygame.transform.scale(frame, (frame_width * scale_factor, frame_height * scale_factor))
+        frames.append(frame)
+
+    flipped = [pygame.transform.flip(frame, True, False) for frame in frames]
+    print(f"Loaded {len(frames)} frames from the sprite sheet.")
+    return Sheet(frames, flipped)
+
+
+def decode_sequence(image_path, num_frames, scale_factor=1, images=None):
+    """
+    Load and scale the numbered frame images of a folder, without caching.
+    A frame that can't be loaded is replaced with a placeholder.
+    Args:
+        images (list): The frames already read with read_image (default is to read them now).
+    """
+    frames = []
+    for path, image in zip(sequence_paths(image_path, num_frames), images or [None] * num_frames):
+        image = _read_or_placeholder(path, image, (64, 64)).convert_alpha()
+        image = pygame.transform.scale(image, (image.get_width() * scale_factor, image.get_height() * scale_factor))
+        frames.append(image)
+    return frames
+
+
+def decode_image(image_path, size=None, image=None):
+    """
+    Load a single image without per-pixel alpha (e.g. a backdrop), optionally scaled to size, without caching.
+    A colorkey in the file is kept. An image that can't be loaded is replaced with a placeholder.
+    Args:
+        image (pygame.Surface): The image already read with read_image (default is to read it now).
+    """
+    image = _read_or_placeholder(image_path, image, size or (64, 64)).convert()
+    if size:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def decode_sprite(image_path, scale_factor=1, image=None):
+    """
+    Load a single image with per-pixel alpha (e.g. a tile) and scale it, without caching.
+    An image that can't be loaded is replaced with a placeholder.
+    Args:
+        image (pygame.Surface): The image already read with read_image (default is to read it now).
+    """
+    image = _read_or_placeholder(image_path, image, (32, 32)).convert_alpha()
+    if scale_factor != 1:
+        image = pygame.transform.scale(image, (image.get_width() * scale_factor, image.get_height() * scale_factor))
+    return image
+
+
+def load_sheet(image_path, frame_width, frame_height, num_frames, scale_factor=2):
+    """
+    Chop a sprite sheet into scaled frames, once per process.
+    The mirrored frames are made up front so nothing has to be flipped per tick.
+    Args:
+        image_path (str): Path to the sprite sheet image.
+        frame_width (int): Width of each frame in the sprite sheet.
+        frame_height (int): Height of each frame in the sprite sheet.
+        num_frames (int): Number of frames in the sprite sheet.
+        scale_factor (int): Factor by which to scale the frames (default is 2).
+    Returns:
+        Sheet of the frames and their mirrored copies. Shared between callers, don't modify.
+    """
+    key = sheet_key(image_path, frame_width, frame_height, num_frames, scale_factor)
+    if key not in _sheets:
+        _sheets[key] = decode_sheet(*key)
+    return _sheets[key]
+
+
+def load_sequence(image_path, num_frames, scale_factor=1):
+    """
+    Load numbered frame images (<image_path>/Explosion_1.png ...) and scale them, once per process.
+    Args:
+        image_path (str): Folder holding the frame images.
+        num_frames (int): Number of frames.
+        scale_factor (float): Factor by which to scale the frames (default is 1).
+    Returns:
+        List of surfaces. Shared between callers, don't modify.
+    """
+    key = sequence_key(image_path, num_frames, scale_factor)
+    if key not in _sequences:
+        _sequences[key] = decode_sequence(*key)
+    return _sequences[key]
+
+
+def load_image(image_path, size=None):
+    """
+    Load an image without per-pixel alpha, converted to the display format, once per process.
+    Args:
+        image_path (str): Path to the image.
+        size (tuple): Size to scale the image to (default is the image's own size).
+    Returns:
+        Surface. Shared between callers, don't modify.
+    """
+    key = image_key(image_path, size)
+    if key not in _images:
+        _images[key] = decode_image(*key)
+    return _images[key]
+
+
+def load_sprite(image_path, scale_factor=1):
+    """
+    Load an image with per-pixel alpha and scale it, once per process.
+    Args:
+        image_path (str): Path to the image.
+        scale_factor (int): Factor by which to scale the image (default is 1).
+    Returns:
+        Surface. Shared between callers, don't modify.
+    """
+    key = sprite_key(image_path, scale_factor)
+    if key not in _sprites:
+        _sprites[key] = decode_sprite(*key)
+    return _sprites[key]
+
+
+def cached_sheet(image_path, frame_width, frame_height, num_frames, scale_factor=2):
+    """
+    Return the sheet load_sheet would, if it's already cached, otherwise None.
+    """
+    return _sheets.get(sheet_key(image_path, frame_width, frame_height, num_frames, scale_factor))
+
+
+def preload_sheet(key, sheet):
+    """
+    Put already prepared frames (e.g. from the texture atlas) into the sheet cache.
+    """
+    _sheets[key] = sheet
+
+
+def preload_sequence(key, frames):
+    _sequences[key] = frames
+
+
+def preload_image(key, image):
+    _images[key] = image
+
+
+def preload_sprite(key, image):
+    _sprites[key] = image
+
+
+def cached_surfaces():
+    """
+    Count the surfaces held in the caches.
+    """
+    return (sum(len(sheet.frames) + len(sheet.flipped) for sheet in _sheets.values())
+            + sum(len(frames) for frames in _sequences.values()) + len(_images) + len(_sprites))
+
+
+def clear_cache():
+    """
+    Forget every cached surface.
+    """
+    _sheets.clear()
+    _sequences.clear()
+    _images.clear()
+    _sprites.clear()
@@ -0,0 +1,288 @@
+"""
+Offline texture atlas build step.
+
+Packs every frame the game uses into a few pre-scaled atlas pages and writes
+them, raw and ready to upload, to ATLAS_DIR together with an index file.
+load_atlas() reads the pages back in one read and fills the assets caches,
+so nothing is decoded or scaled; the game instead has AssetLoader read just
+the pages it needs, in the background (see loader.py). The atlas is rebuilt
+automatically whenever a source image's timestamp changes.
+
+    python atlas.py          # build (or refresh) the atlas
+    python atlas.py --force  # build it from scratch
+    python bench.py --atlas  # compare PNG decoding with cold and warm atlas launches
+"""
+import argparse
+import json
+import os
+import shutil
+
+import pygame
+
+import assets
+
+ATLAS_DIR = '.atlas_cache'
+INDEX_FILE = 'index.json'
+DATA_FILE = 'atlas.bin'
+PAGE_SIZE = 2048  # Width and maximum height of a sprite atlas page
+VERSION = 2
+
+# Everything the game draws from images/
+MANIFEST = [
+    {'kind': 'sheet', 'path': 'images/Soldier_1/Walk.png', 'frame_width': 128, 'frame_height': 128, 'num_frames': 7, 'scale_factor': 2},
+    {'kind': 'sheet', 'path': 'images/Centipede/Centipede_sneer.png', 'frame_width': 72, 'frame_height': 72, 'num_frames': 4, 'scale_factor': 2},
+    {'kind': 'sequence', 'path': 'images/PNG/Explosion_9', 'num_frames': 10, 'scale_factor': 0.1},
+    {'kind': 'image', 'path': 'images/stage.png', 'size': None},
+] + [
+    # Parallax layers, farthest first (see background.py)
+    {'kind': 'image', 'path': f'images/Background/Layers/{layer}.png', 'size': [1778, 1000]}
+    for layer in range(1, 6)
+]
+
+
+def _sources(entry):
+    """
+    Return the image files an entry is made from.
+    """
+    if entry['kind'] == 'sequence':
+        return assets.sequence_paths(entry['path'], entry['num_frames'])
+    return [entry['path']]
+
+
+def _timestamps(manifest):
+    return {path: os.stat(path).st_mtime_ns for entry in manifest for path in _sources(entry)}
+
+
+def _decode(entry):
+    """
+    Get an entry's frames, decoding its PNGs unless they are already in the assets caches.
+    Returns:
+        (frames, flipped) lists; flipped is empty for entries that are never mirrored.
+    """
+    if entry['kind'] == 'sheet':
+        sheet = assets.load_sheet(entry['path'], entry['frame_width'], entry['frame_height'],
+                                  entry['num_frames'], entry['scale_factor'])
+        return sheet.frames, sheet.flipped
+    if entry['kind'] == 'sequence':
+        return assets.load_sequence(entry['path'], entry['num_frames'], entry['scale_factor']), []
+    return [assets.load_image(entry['path'], entry['size'])], []
+
+
+def _pack(sizes):
+    """
+    Shelf-pack rectangles onto pages PAGE_SIZE wide, tallest first.
+    Args:
+        sizes (list): (width, height) of every rectangle.
+    Returns:
+        (placements, pages): [page, x, y] per rectangle, and [width, height] per page.
+    """
+    placements = [None] * len(sizes)
+    pages = []
+    x = y = shelf_height = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        width, height = sizes[i]
+        if not pages:
+            pages.append([0, 0])
+        if x + width > PAGE_SIZE:  # Start a new shelf
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if y + height > PAGE_SIZE:  # Start a new page
+            pages.append([0, 0])
+            x = y = shelf_height = 0
+        placements[i] = [len(pages) - 1, x, y]
+        x += width
+        shelf_height = max(shelf_height, height)
+        pages[-1] = [max(pages[-1][0], x), max(pages[-1][1], y + height)]
+    return placements, pages
+
+
+def build_atlas(manifest=MANIFEST):
+    """
+    Decode, scale and pack every entry of the manifest.
+    Sprite frames share RGBA pages; opaque images get an RGB page each.
+    Returns:
+        (index, data): the index dictionary and the raw bytes of every page.
+    """
+    decoded = [_decode(entry) for entry in manifest]
+
+    # Pack all alpha frames together
+    sprites = [frame for entry, (frames, flipped) in zip(manifest, decoded) if entry['kind'] != 'image'
+               for frame in frames + flipped]
+    placements, page_sizes = _pack([frame.get_size() for frame in sprites])
+    pages = [pygame.Surface(size, pygame.SRCALPHA, 32) for size in page_sizes]
+    for frame, (page, x, y) in zip(sprites, placements):
+        pages[page].blit(frame, (x, y), special_flags=pygame.BLEND_RGBA_ADD)  # Exact copy onto the empty page
+
+    index = {'version': VERSION, 'manifest': manifest, 'sources': _timestamps(manifest), 'pages': [], 'assets': []}
+    blobs = []
+    offset = 0
+    for page in pages:
+        blobs.append(pygame.image.tobytes(page, 'RGBA'))
+        index['pages'].append({'offset': offset, 'size': list(page.get_size()), 'format': 'RGBA'})
+        offset += len(blobs[-1])
+
+    placed = iter(zip(sprites, placements))
+    for entry, (frames, flipped) in zip(manifest, decoded):
+        if entry['kind'] == 'image':
+            blobs.append(pygame.image.tobytes(frames[0], 'RGB'))
+            index['pages'].append({'offset': offset, 'size': list(frames[0].get_size()), 'format': 'RGB'})
+            offset += len(blobs[-1])
+            colorkey = frames[0].get_colorkey()
+            index['assets'].append({'frames': [[len(index['pages']) - 1, 0, 0] + list(frames[0].get_size())], 'flipped': [],
+                                    'colorkey': list(colorkey) if colorkey else None})
+            continue
+        rects = [[page, x, y] + list(frame.get_size()) for frame, (page, x, y) in
+                 (next(placed) for _ in range(len(frames) + len(flipped)))]
+        index['assets'].append({'frames': rects[:len(frames)], 'flipped': rects[len(frames):]})
+
+    return index, b''.join(blobs)
+
+
+def save_atlas(index, data, directory=ATLAS_DIR):
+    """
+    Write the atlas pages and index. The index is written last so a partial write is never read back.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, DATA_FILE), 'wb') as f:
+        f.write(data)
+    with open(os.path.join(directory, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+
+
+def read_index(manifest=MANIFEST, directory=ATLAS_DIR):
+    """
+    Read the index of a previously built atlas.
+    An atlas built from more than the manifest (e.g. the whole of MANIFEST, for a caller that
+    uses part of it) serves it just as well.
+    Returns:
+        The index dictionary, or None when there is no atlas, it lacks an entry of the manifest or it is out of date.
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index.get('version') != VERSION or any(entry not in index['manifest'] for entry in manifest):
+            return None
+        sources = index['sources']
+        if any(sources.get(path) != stamp for path, stamp in _timestamps(manifest).items()):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return index
+
+
+def read_atlas(manifest=MANIFEST, directory=ATLAS_DIR):
+    """
+    Read a previously built atlas.
+    Returns:
+        (index, data), or None when there is no atlas or it is out of date.
+    """
+    index = read_index(manifest, directory)
+    if index is None:
+        return None
+    try:
+        with open(os.path.join(directory, DATA_FILE), 'rb') as f:
+            data = f.read()  # All pages in one read
+    except OSError:
+        return None
+    return index, data
+
+
+def read_page(index, page, directory=ATLAS_DIR):
+    """
+    Read one atlas page into a surface, without converting it to the display format.
+    Safe to call from a worker thread.
+    """
+    page = index['pages'][page]
+    width, height = page['size']
+    with open(os.path.join(directory, DATA_FILE), 'rb') as f:
+        f.seek(page['offset'])
+        data = f.read(width * height * len(page['format']))
+    return pygame.image.frombuffer(data, (width, height), page['format'])
+
+
+def entry_pages(index, entry):
+    """
+    Return the numbers of the atlas pages a manifest entry is cut from.
+    """
+    placed = index['assets'][index['manifest'].index(entry)]
+    return sorted({rect[0] for rect in placed['frames'] + placed['flipped']})
+
+
+def convert_page(index, page, surface):
+    """
+    Convert a page read with read_page (or cut from the atlas data) to the display format.
+    """
+    return surface.convert_alpha() if index['pages'][page]['format'] == 'RGBA' else surface.convert()
+
+
+def install_entry(entry, placed, pages):
+    """
+    Put one manifest entry into the assets caches, cut from its converted pages.
+    Args:
+        entry (dict): The manifest entry.
+        placed (dict): Its rects in the index.
+        pages: Converted page surfaces by page number (a list or a dictionary).
+    """
+    def cut(rects):
+        return [pages[page].subsurface(pygame.Rect(x, y, w, h)) for page, x, y, w, h in rects]
+
+    if entry['kind'] == 'sheet':
+        key = assets.sheet_key(entry['path'], entry['frame_width'], entry['frame_height'],
+                               entry['num_frames'], entry['scale_factor'])
+        assets.preload_sheet(key, assets.Sheet(cut(placed['frames']), cut(placed['flipped'])))
+    elif entry['kind'] == 'sequence':
+        assets.preload_sequence(assets.sequence_key(entry['path'], entry['num_frames'], entry['scale_factor']),
+                                cut(placed['frames']))
+    else:
+        image = cut(placed['frames'])[0]
+        if placed.get('colorkey'):
+            image.set_colorkey(placed['colorkey'])  # Layers use black as their transparent color
+        assets.preload_image(assets.image_key(entry['path'], entry['size']), image)
+
+
+def install_atlas(index, data):
+    """
+    Convert the atlas pages to the display format and put every entry into the assets caches.
+    """
+    view = memoryview(data)
+    pages = []
+    for number, page in enumerate(index['pages']):
+        width, height = page['size']
+        length = width * height * len(page['format'])
+        surface = pygame.image.frombuffer(view[page['offset']:page['offset'] + length], (width, height), page['format'])
+        pages.append(convert_page(index, number, surface))
+
+    for entry, placed in zip(index['manifest'], index['assets']):
+        install_entry(entry, placed, pages)
+
+
+def load_atlas(manifest=MANIFEST, directory=ATLAS_DIR):
+    """
+    Fill the assets caches from the atlas, rebuilding it first if any source image changed.
+    Needs a display mode to be set.
+    Returns:
+        True if the atlas was up to date (warm launch), False if it had to be rebuilt (cold launch).
+    """
+    atlas = read_atlas(manifest, directory)
+    warm = atlas is not None
+    if not warm:
+        atlas = build_atlas(manifest)
+        try:
+            save_atlas(*atlas, directory)
+        except OSError as err:
+            print(f"Could not write texture atlas: {err}")
+    install_atlas(*atlas)
+    return warm
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the texture atlas used at startup.")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the atlas is up to date")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # No window needed to build
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    if args.force:
+        shutil.rmtree(ATLAS_DIR, ignore_errors=True)
+    print("Atlas up to date." if load_atlas() else f"Atlas written to {ATLAS_DIR}/.")
@@ -0,0 +1,49 @@
+import pygame
+
+from assets import load_image
+
+
+class ParallaxBackground:
+    """
+    Layered scrolling background.
+    Each layer is loaded once, converted to the display format and scrolled at
+    its own rate of the camera's movement (0 stays still, 1 moves with the world).
+    Only the part of a layer that is on screen is blitted, so the cost per frame
+    depends on the screen size, not the world size.
+    """
+    def __init__(self, layers, size=None, repeat=True):
+        """
+        Args:
+            layers (list): (image_path, rate) pairs, farthest layer first.
+            size (tuple): Size to scale every layer to (default is the image's own size).
+            repeat (bool): Tile layers horizontally so they never run out (default is True).
+        """
+        self.layers = [(load_image(path, size), rate) for path, rate in layers]
+        self.repeat = repeat
+
+    def draw(self, surface, camera):
+        """
+        Draw every layer for the camera's current position.
+        """
+        view_width, view_height = surface.get_size()
+        for image, rate in self.layers:
+            width, height = image.get_size()
+            offset_x = round(camera.camera.x * rate)
+            offset_y = round(camera.camera.y * rate)
+
+            if not self.repeat:
+                # Blit the part of the layer that overlaps the screen
+                visible = pygame.Rect(offset_x, offset_y, width, height).clip(surface.get_rect())
+                if visible.width and visible.height:
+                    surface.blit(image, visible.topleft, visible.move(-offset_x, -offset_y))
+                continue
+
+            # Tile horizontally, starting from the layer column at the screen's left edge
+            src_x = -offset_x % width
+            src_y = min(max(-offset_y, 0), max(height - view_height, 0))
+            x = 0
+            while x < view_width:
+                span = min(width - src_x, view_width - x)
+                surface.blit(image, (x, 0), pygame.Rect(src_x, src_y, span, view_height))
+                x += span
+                src_x = 0
@@ -0,0 +1,465 @@
+"""
+Benchmark suite: replays scripted input scenarios through loop.py and reports
+frame-time distributions and allocation counts.
+
+    python bench.py                      # every scenario, headless (simulation only)
+    python bench.py --render             # simulate and render every tick on the dummy video driver
+    python bench.py rapid_fire           # selected scenarios
+    python bench.py --recording my.inp   # a recording made with loop.py --record
+    python bench.py --gc manual          # with garbage collection moved between frames
+    python bench.py --trails             # trail vertices and draw time at each level of detail
+    python bench.py --missing-assets     # check the game plays on with soldier sheets deleted
+    python bench.py --atlas              # startup loading from PNGs against cold and warm texture atlas launches
+    python bench.py --levels             # first frame of a wide level from text against from the packed file
+    python bench.py --loader             # startup loading until the first frame, with and without the background loader
+    python bench.py --animations         # soldier states loaded up front against on first use, under the memory budget
+    python bench.py --particles          # update and draw time of thousands of effects, as arrays against as sprites
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pygame
+
+import animation
+import assets
+import atlas
+from camera import Camera
+from gcschedule import GC_AUTO, GC_MODES
+from levelpack import load_level, pack_level, packed_path
+from loader import PREFETCH, REQUIRED, AssetLoader
+from particles import ParticleSystem
+from replay import KEY_DOWN, KEY_UP, write_recording
+from tilemap import LEGEND, TileMap, read_level, tile_entries
+from trails import TRAIL_LOD, TRAIL_TOLERANCE, TrailRenderer
+from trajectory import ShapeCache
+
+SPACE = ord(' ')
+
+
+def press(records, tick, key, hold=1):
+    """
+    Add a key press at tick, released hold ticks later.
+    """
+    records.append((tick, KEY_DOWN, key))
+    records.append((tick + hold, KEY_UP, key))
+
+
+def idle():
+    return 2000, []
+
+
+def rapid_fire():
+    """
+    30 shots in rapid succession while moving left and jumping.
+    """
+    records = [(0, KEY_DOWN, pygame.K_LEFT)]
+    for shot in range(30):
+        press(records, 1 + shot * 2, SPACE)
+    for jump in range(0, 60, 20):
+        press(records, 5 + jump, pygame.K_UP)
+    records.append((61, KEY_UP, pygame.K_LEFT))
+    return 1200, records
+
+
+def strafe_fire():
+    """
+    Run back and forth across the level, firing every 10 ticks.
+    """
+    records = []
+    for lap in range(8):
+        key = pygame.K_RIGHT if lap % 2 == 0 else pygame.K_LEFT
+        press(records, lap * 250, key, hold=240)
+    for shot in range(0, 2000, 10):
+        press(records, shot, SPACE)
+    return 2400, records
+
+
+def soak():
+    """
+    A long session of steady fire, for catching growth over time.
+    """
+    records = []
+    for shot in range(0, 20000, 5):
+        press(records, shot, SPACE)
+    return 20000, records
+
+
+SCENARIOS = {
+    'idle': idle,
+    'rapid_fire': rapid_fire,
+    'strafe_fire': strafe_fire,
+    'soak': soak,
+}
+
+
+def run(recording, ticks, render=False, gc_mode='auto'):
+    """
+    Replay a recording through loop.py and return its per-frame trace rows.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        trace = os.path.join(directory, 'trace.json')
+        command = [sys.executable, 'loop.py', '--replay', recording, '--trace', trace, '--gc', gc_mode]
+        command.append('--uncapped' if render else '--headless')
+        if ticks is not None:
+            command += ['--ticks', str(ticks)]
+        env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+        subprocess.run(command, check=True, env=env, stdout=subprocess.DEVNULL)
+        with open(trace) as f:
+            return json.load(f)['frames']
+
+
+def report(name, frames):
+    frame_ms = np.array([row['frame_ms'] for row in frames])
+    blocks = np.array([row['alloc_blocks'] for row in frames])
+    collections = sum(row['gc'] for row in frames)
+    p50, p95, p99 = np.percentile(frame_ms, (50, 95, 99))
+    print(f"{name:<16}{len(frames):>7}{p50:>9.3f}{p95:>9.3f}{p99:>9.3f}{frame_ms.max():>9.3f}"
+          f"{blocks.mean():>11.1f}{blocks.sum():>11}{collections:>6}")
+
+
+# Equations for the trail benchmark: straight, gently curved, wavy and stepped paths
+TRAIL_EQUATIONS = ('x*0.3', 'x*x/2500', 'sin(x/40)*100', 'sin(50*x)*50', 'tan(x/100)*20', 'floor(x/100)*20')
+
+
+def pixels_apart(a, b, limit=16):
+    """
+    Return how many pixels any pixel set in one mask is from the nearest set in the other
+    (king moves, up to limit).
+    """
+    def grow(mask):
+        grown = mask.copy()
+        grown[1:] |= mask[:-1]
+        grown[:-1] |= mask[1:]
+        grown[:, 1:] |= grown[:, :-1].copy()
+        grown[:, :-1] |= grown[:, 1:].copy()
+        return grown
+
+    near_a, near_b = a, b
+    for distance in range(limit):
+        if not (a & ~near_b).any() and not (b & ~near_a).any():
+            return distance
+        near_a, near_b = grow(near_a), grow(near_b)
+    return limit
+
+
+def trails(runs=200):
+    """
+    Draw each benchmark equation's trail from all of its points and at every level of detail,
+    reporting vertices, draw time and how far in pixels the result is from the full trail.
+    """
+    shapes = ShapeCache()
+    renderer = TrailRenderer((1000, 720))
+    origin = np.array([0, 360])
+
+    def render(points):
+        renderer.begin()
+        start = time.perf_counter()
+        for _ in range(runs):
+            renderer.draw(points, (0, 0, 255, 255), 2)
+        elapsed = (time.perf_counter() - start) / runs * 1000
+        return elapsed, pygame.surfarray.array_alpha(renderer.overlay) > 0
+
+    print(f"{'equation':<18}{'tolerance':>10}{'vertices':>10}{'draw ms':>10}{'speedup':>9}{'px apart':>10}")
+    for text in TRAIL_EQUATIONS:
+        shape = shapes.get(text)
+        full_ms, full = render(shape + origin)
+        print(f"{text:<18}{'full':>10}{len(shape):>10}{full_ms:>10.3f}{1:>9.1f}{0:>10}")
+        for _, factor in TRAIL_LOD:
+            tolerance = TRAIL_TOLERANCE * factor
+            outline = shapes.simplified(shape, tolerance)
+            ms, drawn = render(outline + origin)
+            print(f"{'':<18}{tolerance:>10.1f}{len(outline):>10}{ms:>10.3f}{full_ms / ms:>9.1f}"
+                  f"{pixels_apart(drawn, full):>10}")
+
+
+def open_display(size=(960, 720)):
+    """
+    Set a display mode on the dummy video driver; surfaces can't be converted without one.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode(size)
+
+
+def timed(action):
+    """
+    Run action with the assets caches emptied first, returning how long it took in ms.
+    """
+    assets.clear_cache()
+    start = time.perf_counter()
+    action()
+    return (time.perf_counter() - start) * 1000
+
+
+def atlas_launch(manifest=atlas.MANIFEST, directory=atlas.ATLAS_DIR, runs=5):
+    """
+    Time startup asset loading: decoding PNGs directly, a cold atlas launch and a warm atlas launch.
+    """
+    direct = min(timed(lambda: [atlas._decode(entry) for entry in manifest]) for _ in range(runs))
+
+    cold = []
+    for _ in range(runs):
+        shutil.rmtree(directory, ignore_errors=True)
+        cold.append(timed(lambda: atlas.load_atlas(manifest, directory)))
+    warm = min(timed(lambda: atlas.load_atlas(manifest, directory)) for _ in range(runs))
+
+    print(f"PNG decode + scale: {direct:8.1f} ms")
+    print(f"Cold atlas launch:  {min(cold):8.1f} ms (build and write)")
+    print(f"Warm atlas launch:  {warm:8.1f} ms ({direct / warm:.1f}x faster than decoding)")
+
+
+def loader_startup(directory=atlas.ATLAS_DIR, runs=5):
+    """
+    Time startup asset loading until the first frame can be drawn: everything up front through
+    the texture atlas, against only the first frame's assets through the loader, cold and warm.
+    """
+    needed_now = {'images/Soldier_1/Walk.png', 'images/Centipede/Centipede_sneer.png', 'images/stage.png'}
+
+    def with_loader():
+        loader = AssetLoader(directory=directory)
+        for entry in atlas.MANIFEST:
+            loader.request(entry, REQUIRED if entry['path'] in needed_now else PREFETCH)
+        for entry in tile_entries():
+            loader.request(entry, REQUIRED)
+        loader.wait(REQUIRED)
+        loader.executor.shutdown(wait=False, cancel_futures=True)  # The prefetches aren't timed
+
+    def cold(action):
+        times = []
+        for _ in range(runs):
+            shutil.rmtree(directory, ignore_errors=True)
+            times.append(timed(action))
+        return min(times)
+
+    cold_atlas = cold(lambda: atlas.load_atlas(directory=directory))
+    cold_loader = cold(with_loader)
+    atlas.load_atlas(directory=directory)  # Build it for the warm runs
+    warm_atlas = min(timed(lambda: atlas.load_atlas(directory=directory)) for _ in range(runs))
+    warm_loader = min(timed(with_loader) for _ in range(runs))
+
+    print(f"Cold launch, whole atlas:          {cold_atlas:8.1f} ms")
+    print(f"Cold launch, loader (first frame): {cold_loader:8.1f} ms")
+    print(f"Warm launch, whole atlas:          {warm_atlas:8.1f} ms")
+    print(f"Warm launch, loader (first frame): {warm_loader:8.1f} ms")
+
+
+def animation_loading(ticks=4000, budget=32 * 1024 * 1024):
+    """
+    Compare loading every state of every soldier up front against animators loading states
+    on first use, playing a random mix of states under a memory budget: the player alone,
+    then all three soldiers at once.
+    """
+    start = time.perf_counter()
+    eager = [assets.decode_sheet(entry['path'], entry['frame_width'], entry['frame_height'], entry['num_frames'], entry['scale_factor'])
+             for entry in (animation.soldier_entry(variant, state) for variant in animation.SOLDIERS for state in animation.TIMELINES)]
+    eager_ms = (time.perf_counter() - start) * 1000
+    eager_bytes = sum(animation.sheet_bytes(sheet) for sheet in eager)
+    del eager
+    print(f"Every state up front:  {eager_ms:8.1f} ms, {eager_bytes / 2 ** 20:6.1f} MiB")
+
+    one_shots = [state for state, timeline in animation.TIMELINES.items() if timeline.ending == animation.RETURN]
+    weights = [20, 5, 3, 2, 1, 1]  # Shot_1 far more often than the rest
+    for soldiers in (animation.SOLDIERS[:1], animation.SOLDIERS):
+        rng = random.Random(1)
+        cache = animation.AnimationCache(budget)
+        start = time.perf_counter()
+        animators = [animation.Animator(variant, cache=cache) for variant in soldiers]
+        for animator in animators:
+            animator.frame(0)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for tick in range(1, ticks):
+            for animator in animators:
+                if rng.random() < 0.01:
+                    animator.set_base(rng.choice(('Idle', 'Walk', 'Run')), tick)
+                if rng.random() < 0.02:
+                    animator.play(rng.choices(one_shots, weights)[0], tick)
+                animator.frame(tick)
+        play_ms = (time.perf_counter() - start) * 1000
+        print(f"{len(soldiers)} soldier(s) on first use: {first_ms:6.1f} ms to the first frame, "
+              f"{ticks} ticks in {play_ms:.1f} ms, {cache.stats()}")
+
+
+def particle_effects(counts=(100, 1000, 5000, 10000), ticks=40):
+    """
+    Time updating and drawing many effects at once, against one pygame sprite per effect
+    that keeps its own clock, the way explosions used to be animated.
+    """
+    surface = pygame.display.get_surface()
+    width, height = surface.get_size()
+    camera = Camera(width, height, (width, height))
+    frames = assets.load_sequence('images/PNG/Explosion_9', 10, scale_factor=0.1)  # The explosion shown on hits
+    rng = np.random.default_rng(1)
+
+    class Effect(pygame.sprite.Sprite):
+        def __init__(self, x, y):
+            super().__init__()
+            self.index = 0
+            self.image = frames[0]
+            self.rect = self.image.get_rect(center=(x, y))
+            self.last_update = pygame.time.get_ticks()
+
+        def update(self):
+            now = pygame.time.get_ticks()
+            if now - self.last_update > 40:
+                self.last_update = now
+                self.index = (self.index + 1) % len(frames)
+                self.image = frames[self.index]
+
+    print(f"{'effects':>8}{'sprites ms':>12}{'arrays ms':>11}{'cells':>7}")
+    for count in counts:
+        points = rng.uniform((0, 0), (width, height), (count, 2))
+        sprites = pygame.sprite.Group(Effect(x, y) for x, y in points.tolist())
+        start = time.perf_counter()
+        for _ in range(ticks):
+            sprites.update()
+            sprites.draw(surface)
+        sprite_ms = (time.perf_counter() - start) / ticks * 1000
+
+        particles = ParticleSystem()
+        particles.register('effect', frames)
+        for x, y in points.tolist():
+            particles.emit('effect', x, y, lifetime=10 * ticks)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            particles.update()
+            cells = particles.draw(surface, camera)
+        array_ms = (time.perf_counter() - start) / ticks * 1000
+        print(f"{count:>8}{sprite_ms:>12.2f}{array_ms:>11.2f}{len(cells):>7}")
+
+
+def level_startup(columns=4000, rows=16, runs=5):
+    """
+    Time getting to the first frame of a wide generated level: from text, and from the packed file.
+    """
+    screen = pygame.display.get_surface()
+    tiles = np.zeros((rows, columns), dtype=np.uint8)
+    tiles[rows // 2] = 2
+    tiles[rows // 2 + 1:] = 12
+    with tempfile.TemporaryDirectory() as directory:
+        text = os.path.join(directory, 'wide.txt')
+        symbols = {number: char for char, number in LEGEND.items()}
+        with open(text, 'w') as f:
+            f.write('\n'.join(''.join(symbols[number] for number in line) for line in tiles) + '\n')
+        pack_level(read_level(text), packed_path(text))
+
+        def first_frame(open_level):
+            start = time.perf_counter()
+            level = open_level()
+            camera = Camera(*screen.get_size(), level.rect.size)
+            camera.update(pygame.Rect(level.rect.centerx, level.rect.centery, 1, 1))
+            level.draw(screen, camera)
+            return (time.perf_counter() - start) * 1000, level
+
+        text_ms = min(first_frame(lambda: TileMap.load(text))[0] for _ in range(runs))
+        packed_ms, level = min((first_frame(lambda: load_level(text)) for _ in range(runs)), key=lambda r: r[0])
+
+        # Scroll across the whole level and check the cache stays bounded
+        camera = Camera(*screen.get_size(), level.rect.size)
+        most = 0
+        for x in range(0, level.rect.width, 64):
+            camera.update(pygame.Rect(x, level.rect.centery, 1, 1))
+            level.stream(camera, screen.get_size())
+            level.draw(screen, camera)
+            most = max(most, len(level.chunks))
+
+    print(f"Level: {columns}x{rows} tiles, {level.source.chunk_columns * -(-rows // level.chunk_tiles)} chunks")
+    print(f"Text level to first frame:   {text_ms:8.1f} ms")
+    print(f"Packed level to first frame: {packed_ms:8.1f} ms")
+    print(f"Chunks resident while scrolling across: at most {most} (budget {level.max_chunks})")
+
+
+# Sheets the missing-assets check deletes: one loaded at startup, one the first time the player shoots
+MISSING_SHEETS = ('images/Soldier_1/Idle.png', 'images/Soldier_1/Shot_1.png')
+
+
+def missing_assets(ticks=200):
+    """
+    Replay rapid_fire headless in a copy of the game with MISSING_SHEETS deleted,
+    checking that it plays on with placeholders instead of crashing.
+    Returns:
+        True if the game ran to the end.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    _, records = rapid_fire()
+    with tempfile.TemporaryDirectory() as directory:
+        for name in os.listdir(here):
+            if name.endswith('.py'):
+                shutil.copy(os.path.join(here, name), directory)
+        for folder in ('images', 'levels'):
+            shutil.copytree(os.path.join(here, folder), os.path.join(directory, folder))
+        for path in MISSING_SHEETS:
+            os.remove(os.path.join(directory, path))
+        recording = os.path.join(directory, 'rapid_fire.inp')
+        write_recording(recording, sorted(records))
+        env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy')
+        result = subprocess.run([sys.executable, 'loop.py', '--headless', '--replay', recording, '--ticks', str(ticks)],
+                                cwd=directory, env=env, capture_output=True, text=True)
+
+    hits = result.stdout.count('Hit\n')
+    if result.returncode:
+        print(f"Crashed with {', '.join(MISSING_SHEETS)} missing:\n{result.stderr}")
+        return False
+    print(f"Played {ticks} ticks ({hits} hits) with {', '.join(MISSING_SHEETS)} missing")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay input scenarios through the game loop and report frame times.")
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--recording', action='append', default=[], help="also run a recording made with loop.py --record")
+    parser.add_argument('--render', action='store_true', help="render every tick too (dummy video driver)")
+    parser.add_argument('--gc', choices=GC_MODES, default=GC_AUTO, help="garbage collection mode passed to loop.py")
+    parser.add_argument('--trails', action='store_true', help="compare trail vertices and draw time at each level of detail instead")
+    parser.add_argument('--missing-assets', action='store_true', help="check the game plays on with soldier sheets deleted instead")
+    parser.add_argument('--atlas', action='store_true', help="compare PNG decoding with cold and warm atlas launches instead")
+    parser.add_argument('--levels', action='store_true', help="compare text and packed level startup on a wide level instead")
+    parser.add_argument('--loader', action='store_true', help="time loading until the first frame, with and without the loader, instead")
+    parser.add_argument('--animations', action='store_true', help="compare loading soldier states up front with loading on first use instead")
+    parser.add_argument('--particles', action='store_true', help="time updating and drawing thousands of effects instead")
+    args = parser.parse_args()
+
+    if args.trails:
+        trails()
+        sys.exit()
+    if args.missing_assets:
+        sys.exit(0 if missing_assets() else 1)
+
+    # Measurements of single subsystems, which need a display to convert surfaces
+    measurements = {
+        'atlas': atlas_launch,
+        'levels': level_startup,
+        'loader': loader_startup,
+        'animations': animation_loading,
+        'particles': particle_effects,
+    }
+    for flag, measurement in measurements.items():
+        if getattr(args, flag):
+            open_display()
+            measurement()
+            sys.exit()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+    names = args.scenarios or ([] if args.recording else list(SCENARIOS))
+
+    print(f"{'scenario':<16}{'frames':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'blocks/fr':>11}{'net blocks':>11}{'gcs':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            ticks, records = SCENARIOS[name]()
+            recording = os.path.join(directory, name + '.inp')
+            write_recording(recording, sorted(records))
+            report(name, run(recording, ticks, args.render, args.gc))
+    for recording in args.recording:
+        report(os.path.basename(recording), run(recording, None, args.render, args.gc))
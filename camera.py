@@ -0,0 +1,78 @@
+import numpy as np
+import pygame
+
+
+# Camera class to handle centering the screen on the player
+class Camera:
+    def __init__(self, width, height, world_size=(2000, 1000)):
+        self.camera = pygame.Rect(0, 0, width, height)
+        self.world_size = pygame.Rect((0, 0), world_size)  # Size of the world, e.g. the level's rect
+        self.bounds = pygame.Rect(0, 0, width, height)
+
+    def apply(self, entity):
+        """
+        Moves the entity's rect relative to the camera's position.
+        """
+        if isinstance(entity, pygame.sprite.Sprite):
+            return entity.rect.move(self.camera.topleft)
+        elif isinstance(entity, pygame.Rect):
+            return entity.move(self.camera.topleft)
+        else:
+            raise ValueError("entity must be a pygame.sprite.Sprite or pygame.Rect")
+
+    def apply_points(self, points, origin=None):
+        """
+        Move a whole array of world points to screen coordinates in one step.
+        Args:
+            points: (N, 2) array (or a single [x, y]) of world points.
+            origin: [x, y] added to every point first, for points stored relative to a start (default is none).
+        Returns:
+            int ndarray of the same shape holding screen points.
+        """
+        points = np.asarray(points)
+        if origin is not None:
+            points = points + origin
+        return points.astype(np.int32) + np.array(self.camera.topleft, dtype=np.int32)
+
+    def cull_lines(self, points):
+        """
+        Drop the parts of a polyline that can't be seen.
+        A segment is kept if its bounding box overlaps the viewport, so lines
+        that cross the screen are never cut short.
+        Args:
+            points: (N, 2) array of screen points, as returned by apply_points.
+        Returns:
+            List of (K, 2) arrays, one per visible run of at least two points.
+        """
+        if len(points) < 2:
+            return []
+        x0, y0 = points[:-1, 0], points[:-1, 1]
+        x1, y1 = points[1:, 0], points[1:, 1]
+        visible = ((np.minimum(x0, x1) < self.camera.width) & (np.maximum(x0, x1) >= 0)
+                   & (np.minimum(y0, y1) < self.camera.height) & (np.maximum(y0, y1) >= 0))
+        if visible.all():
+            return [points]
+        if not visible.any():
+            return []
+
+        # Segment i joins point i and i + 1; find where runs of visible segments start and stop
+        edges = np.diff(np.concatenate(([0], visible.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        return [points[start:stop + 1] for start, stop in zip(starts, stops)]
+
+    def update(self, target):
+        """
+        Update the camera's position to follow the target (the player, or a pygame.Rect).
+        """
+        rect = target if isinstance(target, pygame.Rect) else target.rect
+        x = -rect.centerx + int(self.camera.width / 2)
+        y = -rect.centery + int(self.camera.height / 2)
+
+        # Keep the camera inside the world bounds
+        x = min(0, x)
+        y = min(0, y)
+        x = max(-(self.world_size.width - self.camera.width), x)
+        y = max(-(self.world_size.height - self.camera.height), y)
+
+        self.camera = pygame.Rect(x, y, self.camera.width, self.camera.height)
@@ -1,31 +1,234 @@
+"""
+Keyboard input, dispatched through tables instead of if-chains.
+
+Keys are bound to actions (DEFAULT_BINDINGS, or a JSON file of key names
+loaded with load_bindings) and actions to handlers, so rebinding a key never
+touches the code that reacts to it. A press handler that returns False could
+not act yet (e.g. jumping in mid-air); if its action was registered with a
+buffer, the press is kept and retried every tick until it works or expires.
+
+Every press is stamped with the time it was first seen. An InputLatency given
+to the dispatcher records, per action, how long it took from that stamp to
+the first frame presented after the press took effect.
+
+    controls = InputDispatcher(load_bindings('keys.json'), latency=InputLatency())
+    controls.on('jump', press=player.jump, buffer=4)  # jump returns False in the air
+    for event in pygame.event.get():
+        controls.dispatch(event)
+    controls.tick()  # Once per simulation tick, before it runs
+"""
+import json
 import sys
+import time
+
+import numpy as np
 import pygame
 
+# Keys bound to each action unless a bindings file says otherwise
+DEFAULT_BINDINGS = {
+    'left': (pygame.K_LEFT, ord('a')),
+    'right': (pygame.K_RIGHT, ord('d')),
+    'jump': (pygame.K_UP, ord('w')),
+    'shoot': (ord(' '),),
+    'quit': (ord('q'),),
+    'profiler': (pygame.K_F3,),
+    'memory': (pygame.K_F4,),
+}
+
+_KEY_EVENTS = (pygame.KEYDOWN, pygame.KEYUP)
+
+
+def load_bindings(path, defaults=DEFAULT_BINDINGS):
+    """
+    Read key bindings from a JSON file of {action: [key name, ...]}, e.g. {"jump": ["space", "w"]}.
+    Actions the file leaves out keep their default keys.
+    Args:
+        path (str): Bindings file.
+        defaults (dict): Bindings to start from (default is DEFAULT_BINDINGS).
+    Returns:
+        {action: tuple of key codes}.
+    """
+    with open(path) as f:
+        names = json.load(f)
+    bindings = dict(defaults)
+    for action, keys in names.items():
+        if action not in defaults:
+            raise ValueError(f"unknown action {action!r} in {path}")
+        try:
+            bindings[action] = tuple(pygame.key.key_code(key) for key in keys)
+        except ValueError:
+            raise ValueError(f"unknown key name in {path} for {action!r}: {keys!r}")
+    return bindings
+
+
+def save_bindings(path, bindings):
+    """
+    Write key bindings as a JSON file that load_bindings can read back.
+    """
+    with open(path, 'w') as f:
+        json.dump({action: [pygame.key.name(key) for key in keys] for action, keys in bindings.items()}, f, indent=2)
+
+
+def wait_for_input(deadline, wake=True):
+    """
+    Sleep until deadline in short naps, watching for key events to arrive.
+    Args:
+        deadline (float): time.perf_counter() to wait until.
+        wake (bool): Return as soon as a key event arrives instead of at the deadline (default is True).
+    Returns:
+        time.perf_counter() at which a key event was first seen waiting, or None.
+    """
+    seen = None
+    while True:
+        now = time.perf_counter()
+        if seen is None and pygame.event.peek(_KEY_EVENTS):
+            seen = now
+            if wake:
+                return seen
+        if now >= deadline:
+            return seen
+        time.sleep(min(deadline - now, 0.001))
+
+
+class InputLatency:
+    """
+    Time from each press to the first frame presented after it took effect, per action.
+    """
+    def __init__(self):
+        self.pending = []  # (action, stamp) of presses applied since the last present
+        self.samples = {}  # Action -> latencies in seconds
+
+    def applied(self, action, stamp):
+        """
+        Note that a press stamped at stamp has just taken effect.
+        """
+        self.pending.append((action, stamp))
+
+    def presented(self, now=None):
+        """
+        Note that a frame was just presented, showing every press applied before it.
+        """
+        if not self.pending:
+            return
+        now = time.perf_counter() if now is None else now
+        for action, stamp in self.pending:
+            self.samples.setdefault(action, []).append(now - stamp)
+        self.pending.clear()
+
+    def summary(self):
+        """
+        Return {action: (presses, p50 ms, p95 ms, max ms)}.
+        """
+        summary = {}
+        for action, samples in self.samples.items():
+            ms = np.array(samples) * 1000
+            p50, p95 = np.percentile(ms, (50, 95))
+            summary[action] = (len(ms), p50, p95, ms.max())
+        return summary
+
+    def report(self):
+        print(f"{'action':<10}{'presses':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}  (input to present)")
+        for action, (presses, p50, p95, worst) in self.summary().items():
+            print(f"{action:<10}{presses:>8}{p50:>9.1f}{p95:>9.1f}{worst:>9.1f}")
+
+
+class InputDispatcher:
+    """
+    Route key events to handlers through a key -> action table and an (event type, action) -> handler table.
+    """
+    def __init__(self, bindings=DEFAULT_BINDINGS, latency=None):
+        """
+        Args:
+            bindings (dict): {action: key codes} (default is DEFAULT_BINDINGS).
+            latency (InputLatency): Records how long presses take to show up (default is not recording).
+        """
+        self.handlers = {}  # (event type, action) -> (handler, ticks a failed press is buffered for)
+        self.buffered = {}  # Action -> (ticks left, handler, stamp) of presses waiting to take effect
+        self.latency = latency
+        self.rebind(bindings)
+
+    def rebind(self, bindings):
+        """
+        Replace every binding.
+        """
+        self.bindings = {action: tuple(keys) for action, keys in bindings.items()}
+        self.keymap = {key: action for action, keys in self.bindings.items() for key in keys}
+
+    def bind(self, action, *keys):
+        """
+        Bind keys to an action instead of its current ones, taking them away from any other action.
+        """
+        bindings = {other: tuple(key for key in bound if key not in keys) for other, bound in self.bindings.items()}
+        bindings[action] = keys
+        self.rebind(bindings)
+
+    def on(self, action, press=None, release=None, buffer=0):
+        """
+        Set what an action does.
+        Args:
+            action (str): Action name.
+            press (callable): Called when one of its keys goes down; returns False if it couldn't act.
+            release (callable): Called when one of its keys comes up.
+            buffer (int): Ticks to keep retrying a press that couldn't act (default is 0, not at all).
+        """
+        if press is not None:
+            self.handlers[pygame.KEYDOWN, action] = (press, buffer)
+        if release is not None:
+            self.handlers[pygame.KEYUP, action] = (release, 0)
+
+    def _applied(self, action, stamp):
+        if self.latency is not None:
+            self.latency.applied(action, stamp)
+
+    def dispatch(self, event, stamp=None):
+        """
+        Run the handler of a key event's action, if it has one.
+        Args:
+            event (pygame.event.Event): Any event; only key presses and releases are looked at.
+            stamp (float): time.perf_counter() the event was first seen (default is now).
+        Returns:
+            The event's action, or None.
+        """
+        if event.type not in _KEY_EVENTS:
+            return None
+        action = self.keymap.get(event.key)
+        entry = self.handlers.get((event.type, action))
+        if entry is None:
+            return action
+        handler, buffer = entry
+        stamp = time.perf_counter() if stamp is None else stamp
+        if handler() is False:
+            if buffer:
+                self.buffered[action] = (buffer, handler, stamp)  # Try again for a few ticks
+        else:
+            self.buffered.pop(action, None)
+            self._applied(action, stamp)
+        return action
+
+    def tick(self):
+        """
+        Retry the buffered presses, dropping those that succeed or run out of ticks. Call once per tick.
+        """
+        for action, (left, handler, stamp) in list(self.buffered.items()):
+            if handler() is not False:
+                del self.buffered[action]
+                self._applied(action, stamp)
+            elif left <= 1:
+                del self.buffered[action]  # Too late, forget it
+            else:
+                self.buffered[action] = (left - 1, handler, stamp)
 
 
-def __main__():
+if __name__ == '__main__':
+    # Print the actions of the keys pressed, to try out bindings: python controls.py [bindings.json]
+    pygame.init()
+    pygame.display.set_mode((320, 240))
+    controls = InputDispatcher(load_bindings(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BINDINGS)
+    for action in controls.bindings:
+        controls.on(action, press=lambda action=action: print(action),
+                    release=lambda action=action: print(action, 'stop'))
     while True:
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+            if event.type == pygame.QUIT or controls.dispatch(event) == 'quit':
                 pygame.quit()
                 sys.exit()
-                break
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT or event.key == ord('a'):
-                    print('left')
-                if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                    print('right')
-                if event.key == pygame.K_UP or event.key == ord('w'):
-                    print('jump')
-
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_LEFT or event.key == ord('a'):
-                    print('left stop')
-                if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                    print('right stop')
-                if event.key == ord('q'):
-                    pygame.quit()
-                    sys.exit()
-                    break
-        
@@ -0,0 +1,70 @@
+import pygame
+
+
+class DirtyRenderer:
+    """
+    Redraw and present only the parts of the screen that changed.
+    The static scene (backdrop, floor) is drawn once into a cached background
+    for the current camera position. Each frame the areas drawn on in the
+    previous frame are restored from that cache, the moving things are drawn
+    again and marked, and only the old and new marked areas are sent to the
+    display. When the camera moves everything is redrawn and flipped instead.
+    """
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.camera_pos = None  # Camera position the cached background was drawn for
+        self.previous = []  # Areas drawn on in the last frame
+        self.current = []  # Areas drawn on in this frame
+        self.full_redraw = True
+        self.pixels_updated = 0  # Pixels sent to the display by the last present, for measuring
+
+    def invalidate(self):
+        """
+        Force a full redraw on the next frame (e.g. after the window was uncovered).
+        """
+        self.camera_pos = None
+
+    def begin(self, camera_pos, draw_background):
+        """
+        Start a frame.
+        Args:
+            camera_pos (tuple): Camera offset; the background is redrawn when it changes.
+            draw_background (callable): Draws the static scene onto the surface it is given.
+        """
+        self.current = []
+        self.full_redraw = camera_pos != self.camera_pos
+        if self.full_redraw:
+            draw_background(self.background)
+            self.camera_pos = camera_pos
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.background, rect, rect)
+
+    def mark(self, rect):
+        """
+        Note an area drawn on this frame. Accepts a Rect, a list of Rects or None.
+        """
+        if rect is None:
+            return
+        if isinstance(rect, list):
+            for r in rect:
+                self.mark(r)
+            return
+        rect = pygame.Rect(rect).clip(self.screen.get_rect())
+        if rect.width and rect.height:
+            self.current.append(rect)
+
+    def present(self):
+        """
+        Push this frame to the display: everything after a full redraw, otherwise only the changed areas.
+        """
+        if self.full_redraw:
+            pygame.display.flip()
+            self.pixels_updated = self.screen.get_width() * self.screen.get_height()
+        else:
+            rects = self.previous + self.current
+            pygame.display.update(rects)
+            self.pixels_updated = sum(rect.width * rect.height for rect in rects)
+        self.previous = self.current
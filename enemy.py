@@ -1,13 +1,15 @@
 import pygame
 import os
+from assets import load_sheet
 
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y, sprite_path, frame_width, frame_height, num_frames, scale_factor=2):
+    def __init__(self, x, y, sprite_path, frame_width, frame_height, num_frames, level, scale_factor=2):
         pygame.sprite.Sprite.__init__(self)
         
-        # Load the sprite sheet and set up the frames
-        self.image = pygame.image.load(sprite_path).convert_alpha()
-        self.frames = self.load_animation_frames(sprite_path, frame_width, frame_height, num_frames, scale_factor)
+        # Set up the frames from the shared sprite sheet cache
+        sheet = load_sheet(sprite_path, frame_width, frame_height, num_frames, scale_factor)
+        self.frames = sheet.frames  # Left-facing frames, as drawn in the sheet
+        self.flipped_frames = sheet.flipped  # Right-facing frames
         self.current_frame = 0  # Start with the first frame
         self.image = self.frames[self.current_frame]
         
@@ -34,27 +36,8 @@ class Enemy(pygame.sprite.Sprite):
         self.left_bound = 100
         self.right_bound = 600
 
-        # Ground level (You can modify this to make the enemy land on different y-values)
-        self.ground_level = 400  # Example ground level
-
-    def load_animation_frames(self, sprite_path, frame_width, frame_height, num_frames, scale_factor=2):
-        """
-        Load and scale the sprite sheet frames into a list.
-        """
-        sprite_sheet = pygame.image.load(sprite_path).convert_alpha()  # Load sprite sheet
-        frames = []
-        sprite_sheet_width, sprite_sheet_height = sprite_sheet.get_size()
-
-        for i in range(num_frames):
-            x = i * frame_width
-            y = 0  # All frames are in the first row
-            frame = sprite_sheet.subsurface(pygame.Rect(x, y, frame_width, frame_height))
-
-            # Scale the frame (increase the size of the sprite)
-            frame = pygame.transform.scale(frame, (frame_width * scale_factor, frame_height * scale_factor))
-            frames.append(frame)
-
-        return frames
+        # Tile map to walk on and bump into
+        self.level = level
 
     def control(self, x, y):
         """
@@ -71,18 +54,16 @@ class Enemy(pygame.sprite.Sprite):
         if not self.on_ground:  # Only apply gravity if not on the ground
             self.movey += self.gravity
 
-        # Move the enemy
-        self.rect.x += self.movex
-        self.rect.y += self.movey
-
-        # Check for collision with the ground (or any surface)
-        if self.rect.bottom >= self.ground_level:
-            self.rect.bottom = self.ground_level  # Stop at the ground level
+        # Move the enemy through the tiles, landing on the ground below
+        self.rect, self.on_ground, blocked = self.level.move(self.rect, self.movex, self.movey)
+        if self.on_ground:
             self.movey = 0  # Stop vertical movement when hitting the ground
-            self.on_ground = True  # Mark that the enemy is on the ground
 
-        # Check if the enemy has hit the boundaries horizontally
-        if self.rect.x <= self.left_bound:
+        # Turn around at a wall or at the patrol boundaries
+        if blocked:
+            self.movex = -self.movex
+            self.facing = 'right' if self.movex > 0 else 'left'
+        elif self.rect.x <= self.left_bound:
             self.movex = abs(self.movex)  # Move right if left boundary is reached
             self.facing = 'right'
         elif self.rect.x >= self.right_bound:
@@ -95,10 +76,9 @@ class Enemy(pygame.sprite.Sprite):
             if self.animation_counter >= self.animation_speed:
                 self.animation_counter = 0
                 self.current_frame = (self.current_frame + 1) % len(self.frames)
-                self.image = self.frames[self.current_frame]
-                
+
                 if self.facing == 'right':
-                    self.image = pygame.transform.flip(self.frames[self.current_frame], True, False)
+                    self.image = self.flipped_frames[self.current_frame]
                 else:
                     self.image = self.frames[self.current_frame]
         else:
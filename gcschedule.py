@@ -0,0 +1,43 @@
+import gc
+
+
+# Garbage collection modes
+GC_AUTO = 'auto'  # Python collects whenever its allocation thresholds are crossed
+GC_OFF = 'off'  # Never collect; reference cycles are leaked
+GC_MANUAL = 'manual'  # Collect only when idle() is called, between frames
+GC_MODES = (GC_AUTO, GC_OFF, GC_MANUAL)
+
+
+class CollectionSchedule:
+    """
+    Keep garbage collection out of the frame-critical section.
+    In off and manual mode automatic collection is disabled and everything
+    allocated during setup is frozen, so later collections skip it. In manual
+    mode idle() runs the collections the thresholds ask for, at a point of the
+    frame the caller chooses (e.g. while waiting for the next frame).
+    """
+    def __init__(self, mode=GC_AUTO):
+        if mode not in GC_MODES:
+            raise ValueError(f"gc mode must be one of {', '.join(GC_MODES)}")
+        self.mode = mode
+        self.collections = 0  # Collections run by idle()
+        if mode != GC_AUTO:
+            gc.disable()
+            gc.freeze()  # Setup objects live for the whole session
+
+    def idle(self):
+        """
+        Run a collection if one is due, the way the automatic collector would pick its generation.
+        Does nothing unless in manual mode.
+        """
+        if self.mode != GC_MANUAL:
+            return
+        young, middle, old = gc.get_count()
+        threshold0, threshold1, threshold2 = gc.get_threshold()
+        if young < threshold0:
+            return
+        generation = 0
+        if middle >= threshold1:
+            generation = 2 if old >= threshold2 else 1
+        gc.collect(generation)
+        self.collections += 1
@@ -1,18 +1,9 @@
 import time
 import pygame
-from math import *
+from trajectory import trajectory
 
 def drawgraph(equationStr = "d[0]=sin(50*x)*50"):
-    plotPoints = []
-    x = 0
-    y = 0
-    for x in range(-500, 500):
-        x = x + 500
-        d = [0]
-        exec(equationStr)
-        y = d[0]
-        y = -y + 300
-        plotPoints.append([x, y])
+    plotPoints = trajectory(equationStr, 0, 300)  # x from 0 to 999, y = 0 at screen y 300
 
     pygame.init()
     screen = pygame.display.set_mode([1000, 600])
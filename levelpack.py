@@ -0,0 +1,129 @@
+"""
+Binary level format, read through mmap.
+
+A packed level is laid out as:
+
+    header      HEADER: magic, version, chunk size, columns, rows, spawn and chunk counts
+    chunk index one little-endian uint32 per chunk, row by row: offset of its tiles, 0 if empty
+    spawns      SPAWN per entity spawn: kind code, column, row
+    tiles       chunk_tiles * chunk_tiles uint8 tile numbers per non-empty chunk
+
+Opening a level maps the file and reads only the header, index and spawns.
+A chunk's tiles are a view straight into the mapping, so they are paged in
+from disk only when the TileMap first asks for them, and dropping the chunk
+from its cache releases them again. Text levels are packed automatically
+next to the source whenever the source is newer.
+
+    python levelpack.py levels/level_1.txt   # pack (or refresh) levels
+    python bench.py --levels                 # compare text and packed level startup
+"""
+import argparse
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from tilemap import TileMap, read_level
+
+MAGIC = b'LVL1'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIII')  # magic, version, chunk_tiles, columns, rows, spawn count, chunk count
+SPAWN = struct.Struct('<BxxxII')  # kind code, column, row
+SPAWN_KINDS = ['player', 'enemy']  # Kind code -> kind
+EXTENSION = '.lvl'
+
+
+def pack_level(grid, path):
+    """
+    Write a level in the packed format.
+    Args:
+        grid (TileGrid): The level.
+        path (str): File to write.
+    """
+    n = grid.chunk_tiles
+    chunk_columns = -(-grid.columns // n)
+    chunk_rows = -(-grid.rows // n)
+    index = np.zeros(chunk_columns * chunk_rows, dtype='<u4')
+    offset = HEADER.size + index.nbytes + SPAWN.size * len(grid.spawns)
+    blobs = []
+    for row in range(chunk_rows):
+        for column in range(chunk_columns):
+            tiles = grid.chunk(column, row)
+            if tiles is not None:
+                index[row * chunk_columns + column] = offset
+                blobs.append(tiles.tobytes())
+                offset += len(blobs[-1])
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, grid.columns, grid.rows, len(grid.spawns), len(index)))
+        f.write(index.tobytes())
+        for kind, column, row in grid.spawns:
+            f.write(SPAWN.pack(SPAWN_KINDS.index(kind), column, row))
+        f.write(b''.join(blobs))
+
+
+class LevelPack:
+    """
+    Chunk source for a packed level, read lazily from a memory-mapped file.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.chunk_tiles, self.columns, self.rows, spawn_count, chunk_count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} packed level")
+        self.chunk_columns = -(-self.columns // self.chunk_tiles)
+        if chunk_count != self.chunk_columns * -(-self.rows // self.chunk_tiles):
+            raise ValueError(f"{path} has a damaged chunk index")
+        self.index = np.frombuffer(self.map, dtype='<u4', count=chunk_count, offset=HEADER.size)
+        offset = HEADER.size + self.index.nbytes
+        self.spawns = []
+        for _ in range(spawn_count):
+            kind, column, row = SPAWN.unpack_from(self.map, offset)
+            self.spawns.append((SPAWN_KINDS[kind], column, row))
+            offset += SPAWN.size
+
+    def chunk(self, column, row):
+        """
+        Return the tiles of one chunk as a read-only view of the file, or None if it is empty.
+        """
+        offset = int(self.index[row * self.chunk_columns + column])
+        if not offset:
+            return None
+        n = self.chunk_tiles
+        return np.frombuffer(self.map, dtype=np.uint8, count=n * n, offset=offset).reshape(n, n)
+
+
+def packed_path(path):
+    return os.path.splitext(path)[0] + EXTENSION
+
+
+def load_level(path, **kwargs):
+    """
+    Open a level for streaming, packing the text source first if the packed file is missing or older.
+    Args:
+        path (str): The text level, or a packed level.
+        **kwargs: Passed on to TileMap.
+    Returns:
+        TileMap reading its chunks from the packed file.
+    """
+    packed = packed_path(path)
+    if packed != path:
+        try:
+            stale = os.stat(packed).st_mtime_ns < os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            stale = True
+        if stale:
+            pack_level(read_level(path), packed)
+    return TileMap(LevelPack(packed), **kwargs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pack text levels into the binary format loaded at startup.")
+    parser.add_argument('levels', nargs='*', help="text level files to pack")
+    args = parser.parse_args()
+
+    for level_path in args.levels:
+        pack_level(read_level(level_path), packed_path(level_path))
+        print(f"Packed {level_path} into {packed_path(level_path)}")
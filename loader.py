@@ -0,0 +1,249 @@
+"""
+Background asset loading.
+
+Assets are requested as manifest entries (see atlas.MANIFEST) with a priority.
+Worker threads read them, either the atlas pages they are cut from when the
+texture atlas is up to date or their PNGs, and the main thread finishes them
+in poll(): converting to the display format has to happen there, and it also
+puts the result into the assets caches, where load_sheet and friends find
+them. Lower priorities are read first and only a few reads run at once, so a
+required asset never waits behind a queue of prefetches.
+
+An asset that can't be read is replaced with a placeholder instead of
+stopping the game. Anything used before it finished loading is simply loaded
+on the spot by the assets functions, as if there were no loader.
+
+    loader = AssetLoader()
+    for entry in MANIFEST:
+        loader.request(entry, REQUIRED if needed_now(entry) else PREFETCH)
+    loader.wait(REQUIRED, show_progress)  # Then start the game, calling loader.poll() every frame
+
+    python bench.py --loader  # time startup loading with and without the loader
+"""
+import heapq
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pygame
+
+import assets
+import atlas
+
+# Priorities, lowest loaded first
+REQUIRED = 0  # Needed for the first frame
+PREFETCH = 1  # Needed later (e.g. explosions, the next level's tiles); loaded in the background
+
+
+def cache_key(entry):
+    """
+    Return the kind and assets cache key of a manifest entry.
+    Entries are sheets, sequences and images as in atlas.MANIFEST, or sprites:
+    {'kind': 'sprite', 'path': ..., 'scale_factor': ...}.
+    """
+    kind = entry['kind']
+    if kind == 'sheet':
+        return kind, assets.sheet_key(entry['path'], entry['frame_width'], entry['frame_height'],
+                                      entry['num_frames'], entry['scale_factor'])
+    if kind == 'sequence':
+        return kind, assets.sequence_key(entry['path'], entry['num_frames'], entry['scale_factor'])
+    if kind == 'image':
+        return kind, assets.image_key(entry['path'], entry['size'])
+    if kind == 'sprite':
+        return kind, assets.sprite_key(entry['path'], entry['scale_factor'])
+    raise ValueError(f"unknown asset kind {kind!r}")
+
+
+def draw_progress(surface, done, total, color=(254, 254, 254)):
+    """
+    Draw a loading bar across the middle of the surface.
+    Returns:
+        The rect of the bar.
+    """
+    width, height = surface.get_size()
+    bar = pygame.Rect(0, 0, width // 2, 24)
+    bar.center = (width // 2, height // 2)
+    pygame.draw.rect(surface, color, bar, 2)
+    filled = bar.inflate(-8, -8)
+    filled.width = round(filled.width * done / max(total, 1))
+    pygame.draw.rect(surface, color, filled)
+    return bar
+
+
+class AssetLoader:
+    """
+    Priority queue of assets read on a thread pool and finished on the main thread.
+    """
+    def __init__(self, workers=2, manifest=atlas.MANIFEST, directory=atlas.ATLAS_DIR):
+        """
+        Args:
+            workers (int): Reads running at once (default is 2).
+            manifest (list): Entries to load from the texture atlas, and to rebuild it from when it is
+                out of date (default is atlas.MANIFEST). An atlas built from more than these is used as is.
+            directory (str): Where the texture atlas is kept (default is atlas.ATLAS_DIR).
+        """
+        self.workers = workers
+        self.manifest = manifest
+        self.directory = directory
+        self.index = atlas.read_index(manifest, directory)  # None if the atlas is missing or out of date
+        self.pages = {}  # Atlas pages converted so far, by page number
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='assets')
+        self.queue = []  # Heap of (priority, request order, key, entry)
+        self.order = itertools.count()
+        self.priority = {}  # Key -> most urgent priority it was requested with
+        self.running = {}  # Future -> (key, entry) being read
+        self.done = set()  # Keys in the assets caches
+        self.failed = []  # Paths replaced with placeholders
+        self.saving = None  # Future of the atlas rebuild, once started
+
+    def request(self, entry, priority=PREFETCH):
+        """
+        Queue an asset, or make an already queued one more urgent.
+        """
+        key = cache_key(entry)
+        if key in self.done:
+            return
+        if key in self.priority and self.priority[key] <= priority:
+            return
+        self.priority[key] = priority
+        heapq.heappush(self.queue, (priority, next(self.order), key, entry))
+
+    def _start(self):
+        """
+        Start reading the most urgent queued assets, keeping at most workers reads running.
+        """
+        reading = {key for key, _ in self.running.values()}
+        while self.queue and len(self.running) < self.workers:
+            priority, _, key, entry = heapq.heappop(self.queue)
+            if key in self.done or key in reading or priority != self.priority[key]:
+                continue  # Already loaded, being read, or queued again more urgently
+            self.running[self.executor.submit(self._read, entry)] = (key, entry)
+            reading.add(key)
+
+    def _read(self, entry):
+        """
+        Read an asset's pixels without touching the display. Runs on a worker thread.
+        Returns:
+            {page number: surface} of the atlas pages it needs that aren't converted yet,
+            or the surface (a list of them for a sequence) read from its PNGs.
+        """
+        if self.index is not None and entry in self.manifest:
+            return {page: atlas.read_page(self.index, page, self.directory)
+                    for page in atlas.entry_pages(self.index, entry) if page not in self.pages}
+        if entry['kind'] == 'sequence':
+            return [assets.read_image(path) for path in assets.sequence_paths(entry['path'], entry['num_frames'])]
+        return assets.read_image(entry['path'])
+
+    def _placeholder(self, entry):
+        """
+        Return stand-in pixels, shaped like what _read returns from PNGs.
+        """
+        kind = entry['kind']
+        if kind == 'sheet':
+            return assets.placeholder((entry['frame_width'] * entry['num_frames'], entry['frame_height']))
+        if kind == 'sequence':
+            return [assets.placeholder((64, 64))] * entry['num_frames']
+        if kind == 'image':
+            return assets.placeholder(entry['size'] or (64, 64))
+        return assets.placeholder((32, 32))
+
+    def _finish(self, key, entry, pixels):
+        """
+        Convert what a worker read and put it into the assets caches. Main thread only.
+        """
+        kind, key = key
+        if isinstance(pixels, dict):
+            for page, surface in pixels.items():
+                if page not in self.pages:
+                    self.pages[page] = atlas.convert_page(self.index, page, surface)
+            atlas.install_entry(entry, self.index['assets'][self.index['manifest'].index(entry)], self.pages)
+        elif kind == 'sheet':
+            assets.preload_sheet(key, assets.decode_sheet(*key, image=pixels))
+        elif kind == 'sequence':
+            assets.preload_sequence(key, assets.decode_sequence(*key, images=pixels))
+        elif kind == 'image':
+            assets.preload_image(key, assets.decode_image(*key, image=pixels))
+        else:
+            assets.preload_sprite(key, assets.decode_sprite(*key, image=pixels))
+
+    def poll(self, budget=None):
+        """
+        Finish the assets the workers have read and start reading the next ones. Call once per frame.
+        Args:
+            budget (float): Seconds to spend finishing before leaving the rest for the next call
+                (default is no limit).
+        Returns:
+            Number of assets finished.
+        """
+        start = time.perf_counter()
+        finished = 0
+        for future in [future for future in self.running if future.done()]:
+            key, entry = self.running.pop(future)
+            try:
+                self._finish(key, entry, future.result())
+            except (pygame.error, OSError, ValueError) as err:
+                print(f"Error loading {entry['path']}: {err}")
+                self.failed.append(entry['path'])
+                self._finish(key, entry, self._placeholder(entry))  # Keep going without it
+            self.done.add(key)
+            finished += 1
+            if budget is not None and time.perf_counter() - start > budget:
+                break
+        self._start()
+        return finished
+
+    def progress(self, priority=REQUIRED):
+        """
+        Return (done, total) of the assets requested at this priority or a more urgent one.
+        """
+        keys = [key for key, wanted in self.priority.items() if wanted <= priority]
+        return sum(key in self.done for key in keys), len(keys)
+
+    def ready(self, priority=REQUIRED):
+        done, total = self.progress(priority)
+        return done == total
+
+    def wait(self, priority=REQUIRED, progress=None, interval=1 / 60):
+        """
+        Block until every asset requested at this priority or a more urgent one is loaded.
+        Args:
+            priority (int): Most relaxed priority to wait for (default is REQUIRED).
+            progress (callable): Called with (done, total) about every interval seconds, e.g. to draw a loading screen.
+            interval (float): Seconds between progress calls (default is 1/60).
+        """
+        self.poll()
+        while not self.ready(priority):
+            if progress is not None:
+                progress(*self.progress(priority))
+            wait(list(self.running), timeout=interval, return_when=FIRST_COMPLETED)
+            self.poll()
+        if progress is not None:
+            progress(*self.progress(priority))
+
+    def idle(self):
+        """
+        Whether nothing is queued or being read.
+        """
+        return not self.running and all(key in self.done for key in self.priority)
+
+    def save_atlas(self):
+        """
+        Rebuild the texture atlas on a worker thread once every manifest entry has loaded from
+        its PNGs, so the next launch reads pages instead. Does nothing if the atlas is up to date,
+        something failed to load, or not all of the manifest was requested.
+        """
+        if self.index is not None or self.saving is not None or self.failed or not self.idle():
+            return
+        if any(cache_key(entry) not in self.done for entry in self.manifest):
+            return
+
+        def rebuild():
+            try:
+                atlas.save_atlas(*atlas.build_atlas(self.manifest), self.directory)
+            except OSError as err:
+                print(f"Could not write texture atlas: {err}")
+
+        self.saving = self.executor.submit(rebuild)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -1,55 +1,66 @@
+import argparse
+import atexit
 import time
 import pygame
 import sys
 import os
-from math import *
+from trajectory import shot_shapes
+from projectiles import ProjectileStore
+from trails import TrailRenderer, trail_color, trail_tolerance
+from camera import Camera
+from levelpack import load_level
+from tilemap import tile_entries
+from spatial import SpatialHash
+from swarm import EnemySwarm
+from dirty import DirtyRenderer
+from assets import load_sequence, cached_surfaces
+from background import ParallaxBackground
+from atlas import MANIFEST
+from loader import AssetLoader, REQUIRED, PREFETCH, draw_progress
+from profiler import FrameProfiler
+from replay import InputRecorder, InputReplay
+from gcschedule import CollectionSchedule, GC_AUTO, GC_MODES
+from particles import DEBRIS_COLORS, SPARK_COLORS, ParticleSystem, solid_frames
+from memtrack import MemoryTracker
+from animation import SOLDIERS, Animator, soldier_animations, soldier_entry
+from controls import DEFAULT_BINDINGS, InputDispatcher, InputLatency, load_bindings, wait_for_input
+
+# Command line options
+parser = argparse.ArgumentParser(description="Run the game.")
+parser.add_argument('--headless', action='store_true', help="simulate without a window or rendering, as fast as possible")
+parser.add_argument('--ticks', type=int, default=None, help="stop after this many simulation ticks")
+parser.add_argument('--profile', action='store_true', help="start with the frame-time overlay shown (F3 toggles it)")
+parser.add_argument('--trace', metavar='FILE', help="record per-frame phase timings to a .csv or .json file on exit")
+parser.add_argument('--record', metavar='FILE', help="record key input, stamped with simulation ticks, to FILE on exit")
+parser.add_argument('--replay', metavar='FILE', help="feed a recording back in; stops after its last event unless --ticks is given")
+parser.add_argument('--uncapped', action='store_true', help="simulate and render one tick per frame as fast as possible (for benchmarks)")
+parser.add_argument('--gc', choices=GC_MODES, default=GC_AUTO,
+                    help="garbage collection: automatic, off, or manual between frames (default: auto)")
+parser.add_argument('--enemies', type=int, default=0, help="add this many extra enemies spread along the level")
+parser.add_argument('--memtrack', type=int, nargs='?', const=400, default=None, metavar='TICKS',
+                    help="trace memory, sampling every TICKS ticks (default 400) and flagging steady growth; "
+                         "F4 or exit prints the top allocations (slow, for investigating leaks)")
+parser.add_argument('--soldier', choices=SOLDIERS, default='Soldier_1', help="which soldier to play (default: Soldier_1)")
+parser.add_argument('--bindings', metavar='FILE', help="read key bindings from a JSON file of {action: [key names]}")
+parser.add_argument('--latency', action='store_true', help="measure the time from each key press to the frame showing it, reported on exit")
+parser.add_argument('--low-latency', action='store_true',
+                    help="wake from the frame wait as soon as a key is pressed and run its tick right away")
+args = parser.parse_args()
+
+if args.headless:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'  # No window, but surfaces and events still work
 
 # Variables
 worldx = 960
 worldy = 720
 fps = 40
-ani = 4
 world = pygame.display.set_mode([worldx, worldy])
 
 BLUE = (25, 25, 200)
 BLACK = (23, 23, 23)
 WHITE = (254, 254, 254)
 ALPHA = (0, 255, 0)
-FLOOR_HEIGHT = 600  # Floor level (adjust as needed)
 
-# Camera class to handle centering the screen on the player
-class Camera:
-    def __init__(self, width, height):
-        self.camera = pygame.Rect(0, 0, width, height)
-        self.world_size = pygame.Rect(0, 0, 2000, 1000)  # Size of the world (adjust this if needed)
-        self.bounds = pygame.Rect(0, 0, width, height)
-
-    def apply(self, entity):
-        """
-        Moves the entity's rect relative to the camera's position.
-        """
-        if isinstance(entity, pygame.sprite.Sprite):
-            return entity.rect.move(self.camera.topleft)
-        elif isinstance(entity, pygame.Rect):
-            return entity.move(self.camera.topleft)
-        else:
-            raise ValueError("entity must be a pygame.sprite.Sprite or pygame.Rect")
-
-    def update(self, target):
-        """
-        Update the camera's position to follow the target (the player).
-        """
-        x = -target.rect.centerx + int(self.camera.width / 2)
-        y = -target.rect.centery + int(self.camera.height / 2)
-
-        # Keep the camera inside the world bounds
-        x = min(0, x)
-        y = min(0, y)
-        x = max(-(self.world_size.width - self.camera.width), x)
-        y = max(-(self.world_size.height - self.camera.height), y)
-
-        self.camera = pygame.Rect(x, y, self.camera.width, self.camera.height)
-     
 # Player class
 class Player(pygame.sprite.Sprite):
     """
@@ -59,61 +70,30 @@ class Player(pygame.sprite.Sprite):
         pygame.sprite.Sprite.__init__(self)
         self.movex = 0
         self.movey = 0
-        self.frame = 0
-        self.images = self.load_animation_frames('images/Soldier_1/Walk.png', 128, 128, 7, scale_factor=2)  # Scale sprite
-        self.image = self.images[0]  # Set the first frame initially
+        self.ticks = 0  # Updates run so far, the clock of the animation
+        self.animation = Animator(args.soldier)  # Idle and Walk load at startup, other states the first time they play
+        self.image = self.animation.frame(self.ticks)
         self.rect = self.image.get_rect()
-        self.rect.x = 100  # Starting X position
-        self.rect.y = FLOOR_HEIGHT - self.rect.height  # Starting Y position (on the floor)
+        self.rect.midbottom = level.spawns('player')[0]  # Start at the level's player spawn
         
         self.velocity_y = 0  # For gravity
         self.on_ground = False
+        self.move(0, level.rect.height)
+        self.hitbox = pygame.Rect(self.rect.x + 80, self.rect.y + 110, self.rect.width - 170, self.rect.height - 100)
+        self.prev_pos = self.rect.topleft  # Position before the last update, for interpolated drawing
 
         self.shooting = False  # Flag to control the shooting action
         self.sphere_radius = 5
-        self.graphs = []  # Store multiple graphs
-        self.sphere_indices = []  # Store the sphere index for each graph
-        self.graph_creation_times = []  # Store the creation time for each graph
+        self.projectiles = ProjectileStore()  # Trajectories, sphere positions and spawn times of live shots
 
         self.facing = 'right'  # New variable to track which direction the character is facing
 
-        self.explosions = pygame.sprite.Group() # store active explosions
-        self.explosion_frames = self.load_explosion_frames('images/PNG/Explosion_9', 10, scale_factor = 0.1)
-
-    def load_animation_frames(self, image_path, frame_width, frame_height, num_frames, scale_factor=2):
+    @property
+    def explosion_frames(self):
         """
-        Chop the sprite sheet into individual frames and scale them.
-        Args:
-            image_path (str): Path to the sprite sheet image.
-            frame_width (int): Width of each frame in the sprite sheet.
-            frame_height (int): Height of each frame in the sprite sheet.
-            num_frames (int): Number of frames in the sprite sheet.
-            scale_factor (int): Factor by which to scale the frames (default is 2).
-        Returns:
-            List of surfaces containing each frame.
+        Frames of the explosion shown on a hit (prefetched in the background at startup).
         """
-        try:
-            sprite_sheet = pygame.image.load(image_path).convert_alpha()  # Load sprite sheet
-        except pygame.error:
-            print(f"Error loading image: {image_path}")
-            sys.exit()  # Exit if image can't be loaded
-
-        frames = []
-        sprite_sheet_width, sprite_sheet_height = sprite_sheet.get_size()
-
-        # Extract frames from sprite sheet
-        for i in range(num_frames):  # Assuming frames are arranged in a single row
-            x = i * frame_width
-            y = 0  # All frames are in the first row
-            frame = sprite_sheet.subsurface(pygame.Rect(x, y, frame_width, frame_height))
-
-            # Scale the frame (increase the size of the sprite)
-            frame = pygame.transform.scale(frame, (frame_width * scale_factor, frame_height * scale_factor))
-
-            frames.append(frame)
-
-        print(f"Loaded {len(frames)} frames from the sprite sheet.")
-        return frames
+        return load_sequence('images/PNG/Explosion_9', 10, scale_factor = 0.1)
 
     def control(self, x, y):
         """
@@ -127,231 +107,503 @@ class Player(pygame.sprite.Sprite):
         Update sprite position.
         Handle gravity and movement.
         """
+        self.ticks += 1
+        self.prev_pos = self.rect.topleft
 
         # Apply gravity only if not on the ground
         if not self.on_ground:
             self.velocity_y += 1  # gravity effect
 
-        # Move player with velocity
-        self.rect.x += self.movex
-        self.rect.y += self.velocity_y
+        # Move player with velocity, stopping at solid tiles
+        self.move(self.movex, self.velocity_y)
+        if self.on_ground:
+            self.velocity_y = 0  # Landed
 
         self.hitbox = pygame.Rect(self.rect.x + 80, self.rect.y + 110, self.rect.width - 170, self.rect.height - 100)
 
-        # Prevent going below the floor (and handle jumping)
-        if self.rect.y >= FLOOR_HEIGHT - self.rect.height:
-            self.rect.y = FLOOR_HEIGHT - self.rect.height
-            self.on_ground = True
-        else:
-            self.on_ground = False
-
-        # Update facing direction based on movement
-        if self.movex < 0:  # Moving left
+        # Face the way it moves, walking while it does and idling otherwise
+        if self.movex < 0:
             self.facing = 'left'
-            self.frame += 1
-            if self.frame >= len(self.images) * ani:
-                self.frame = 0
-            self.image = pygame.transform.flip(self.images[self.frame // ani], True, False)
-        elif self.movex > 0:  # Moving right
+        elif self.movex > 0:
             self.facing = 'right'
-            self.frame += 1
-            if self.frame >= len(self.images) * ani:
-                self.frame = 0
-            self.image = self.images[self.frame // ani]
-        else:  # Idle animation when not moving
-            if self.facing == 'left':  # Keep the left-facing frame if the player was last moving left
-                self.image = self.images[0]  # First frame of the left-facing animation
-                self.image = pygame.transform.flip(self.images[self.frame // ani], True, False)
-            else:  # Keep the right-facing frame if the player was last moving right
-                self.image = self.images[0]  # First frame of the right-facing animation
+        self.animation.set_base('Walk' if self.movex else 'Idle', self.ticks)
+        self.image = self.animation.frame(self.ticks, self.facing == 'left')
+
+    def move(self, dx, dy):
+        """
+        Move the player through the level's tiles.
+        Only the body (the solid part of the sprite, down to the feet) collides.
+        """
+        body = pygame.Rect(self.rect.x + 80, self.rect.y + 110, self.rect.width - 170, self.rect.height - 110)
+        body, self.on_ground, _ = level.move(body, dx, dy)
+        self.rect.x = body.x - 80
+        self.rect.bottom = body.bottom
 
     def jump(self):
         """
         Make the player jump if on the ground
+        Returns:
+            Whether it jumped.
         """
-        if self.on_ground:
-            self.velocity_y = -15  # Jump force
+        if not self.on_ground:
+            return False
+        self.velocity_y = -15  # Jump force
+        return True
 
-    def shootgun(self):
+    def shootgun(self, now=None):
         """
         Start shooting and store graph points to follow
         Freeze the plotPoints
+        Args:
+            now (float): Time of the shot (default is time.time()).
         """
-        graph_points = self.drawgraph()  # Generate graph points
-        self.graphs.append(graph_points)  # Store the graph
-        self.sphere_indices.append(0)  # Add sphere index for the new graph
-        self.graph_creation_times.append(time.time())  # Store the creation time of the graph
+        shape, origin = self.drawgraph()  # Look up the graph's shape and where it starts
+        slot = self.projectiles.spawn(shape, origin, time.time() if now is None else now)  # Start its sphere
+        self.animation.play('Shot_1', self.ticks)
+        schedule_impact(slot)  # Work out now where it will hit the level or a patrolling enemy
 
     def drawgraph(self, equationStr="d[0]=sin(50*x)*50"):
-        plotPoints = []
-        for x in range(self.rect.x, self.rect.x + 1000):  # Adjust range as needed
-            d = [0]
-            exec(equationStr)
-            y = d[0]
-            y = -y + self.rect.y + 155  # Adjust Y value to fit the floor
-            plotPoints.append([x, y])
-
+        """
+        Get the shot equation's shape for the way the player faces, and where it starts in front of the player.
+        The shape is cached and shared between shots; add the start to get world points.
+        Returns:
+            (shape, origin): (1000, 2) array of [x, y] relative to the start, and the start's world [x, y].
+        """
+        y = self.rect.y + 155  # Adjust Y value to fit the floor
         if self.facing == 'left':
-            plotPoints = plotPoints[::-1]  # Reverse the list
-            plotPoints = [[x - 1000, y] for x, y in plotPoints]
-        else:
-            plotPoints = [[x + 180, y] for x, y in plotPoints]
-
-        return plotPoints
+            return shot_shapes.get(equationStr, -1), (self.rect.x - 1, y)  # Mirrored, going left
+        return shot_shapes.get(equationStr, 1), (self.rect.x + 180, y)
     
-    def load_explosion_frames(self, image_path, num_frames, scale_factor = 1):
-        frames = []
-        for i in range(1, num_frames + 1):
-            image = pygame.image.load(f"{image_path}/Explosion_{i}.png").convert_alpha()
-            image = pygame.transform.scale(image, (image.get_width() * scale_factor, image.get_height() * scale_factor))
-            frames.append(image)
-        return frames
-
-# Explosion Class
-class Explosion(pygame.sprite.Sprite):
-    def __init__(self, x, y, frames, duration = 1000):
-        super().__init__()
-        self.frames = frames
-        self.index = 0
-        self.image = self.frames[self.index]
-        self.rect = self.image.get_rect(center=(x, y))
-        self.last_update = pygame.time.get_ticks()
-        self.frame_delay = duration / len(self.frames)
-
-        self.animation_duration = duration 
-
+def show_loading(done, total):
+    """
+    Draw the loading screen, keeping the window responsive while assets load.
+    """
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+    world.fill(BLACK)
+    draw_progress(world, done, total, WHITE)
+    pygame.display.flip()
 
-    def update(self):
-        # animate the explosion 
-        now = pygame.time.get_ticks()
-        if now - self.last_update > self.frame_delay:
-            self.last_update = now
-            self.index += 1
-            
-            if self.index >= len(self.frames):
-                self.kill() # end explosion 
-                return 
-                
-            self.image = self.frames[self.index]   
 
 # Function to draw the graph (Fixed relative to the floor, affected by camera)
 # Setup
-backdrop = pygame.image.load(os.path.join('images', 'stage.png'))
+# Assets load on worker threads: what the first frame shows first, the explosion after the game starts.
+# Only the part of the atlas manifest drawn here is requested (not the parallax layers: the backdrop is stage.png alone)
+loader_states = [soldier_entry(args.soldier, state) for state in ('Idle', 'Walk')]  # The rest load the first time they play
+used = {'images/Centipede/Centipede_sneer.png', 'images/PNG/Explosion_9', 'images/stage.png'}
+loader = AssetLoader(manifest=[entry for entry in MANIFEST if entry['path'] in used or entry in loader_states])
+for entry in loader.manifest:
+    loader.request(entry, PREFETCH if entry['kind'] == 'sequence' else REQUIRED)
+for entry in tile_entries() + loader_states:
+    loader.request(entry, REQUIRED)
+level = load_level(os.path.join('levels', 'level_1.txt'))  # Tiles to stand on, streamed from the packed level in chunks
+loader.wait(REQUIRED, None if args.headless else show_loading)
+background = ParallaxBackground([(os.path.join('images', 'stage.png'), 1.0)], repeat=False)
 clock = pygame.time.Clock()
 pygame.init()
 backdropbox = world.get_rect()
 main = True
 
+# Fixed simulation step
+TICK = 1 / fps  # Seconds of game time per tick
+MAX_SUBSTEPS = 5  # Most ticks run per rendered frame when catching up
+sim_time = 0.0  # Game time in seconds, advanced only by simulate()
+
 player = Player()  # spawn player
 player_list = pygame.sprite.Group()
 player_list.add(player)
 steps = 10
 
+# Enemies from the level's spawns, plus any extra asked for, all updated and drawn together
+enemies = EnemySwarm('images/Centipede/Centipede_sneer.png', 72, 72, 4, level)
+for spawn_x, spawn_bottom in level.spawns('enemy'):
+    enemies.spawn(spawn_x - enemies.width // 2, spawn_bottom - enemies.height)
+for i in range(args.enemies):
+    spawn_x = int((i + 0.5) * level.rect.width / args.enemies)
+    enemies.spawn(spawn_x, 0, spawn_x - 300, spawn_x + 300)
+
 # Camera setup
-camera = Camera(worldx, worldy)
+camera = Camera(worldx, worldy, level.rect.size)
+
+# Frame-time instrumentation, free while the overlay is off and no trace is recorded
+profiler = FrameProfiler(enabled=args.profile, trace=bool(args.trace))
+if args.trace:
+    atexit.register(profiler.export, args.trace)
+
+# Key bindings and what the actions do (set up below), and optionally how long presses take to show
+JUMP_BUFFER = 4  # Ticks a jump pressed in mid-air is kept for, in case the player lands
+latency = None
+if args.latency:
+    latency = InputLatency()
+    atexit.register(latency.report)
+controls = InputDispatcher(load_bindings(args.bindings) if args.bindings else DEFAULT_BINDINGS, latency)
+input_seen = None  # When a key event was first seen waiting during the frame wait, if one was
+
+# Input recording and replay
+recorder = None
+if args.record:
+    recorder = InputRecorder()
+    atexit.register(recorder.save, args.record)
+replay = InputReplay.load(args.replay) if args.replay else None
+ticks = 0  # Simulation ticks run so far
+
+# Explosions, sparks and debris of every hit, updated and drawn together
+particles = ParticleSystem()
+particles.register('explosion', lambda: player.explosion_frames)  # Looked up on the first hit, once it has loaded
+particles.register('spark', solid_frames(SPARK_COLORS, 3))
+particles.register('debris', solid_frames(DEBRIS_COLORS, 4))
+
+# Grid of hittable entities that move unpredictably, rebuilt every frame
+collision_grid = SpatialHash(cell_size=128)
+predicted_version = enemies.version  # Enemy swarm version the scheduled impacts were worked out for
+
+# All graph trails are drawn onto one overlay and blended once per frame
+trail_renderer = TrailRenderer((worldx, worldy))
+
+# Only the areas that changed are redrawn and sent to the display
+dirty_renderer = DirtyRenderer(world)
+
+
+def schedule_impact(slot):
+    """
+    Find the first sample from the sphere's position on at which a shot hits a solid tile or a
+    patrolling enemy, and schedule its hit there. Enemies still falling are left to the per-tick test.
+    """
+    store = player.projectiles
+    points = store.remaining(slot)
+    impacts = [level.first_solid(points)]
+    if not enemies.falling:
+        impacts.append(enemies.first_hit(points, player.sphere_radius))
+    impacts = [impact for impact in impacts if impact is not None]
+    store.impact[slot] = store.cursor[slot] + min(impacts) if impacts else store.length[slot]
 
-# Main Loop
-while main:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            try:
-                sys.exit()
-            finally:
-                main = False
-
-        if event.type == pygame.KEYDOWN:
-            if event.key == ord('q'):
-                pygame.quit()
-                try:
-                    sys.exit()
-                finally:
-                    main = False
-            if event.key == pygame.K_LEFT or event.key == ord('a'):
-                player.control(-steps, 0)
-            if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                player.control(steps, 0)
-            if event.key == pygame.K_UP or event.key == ord('w'):
-                player.jump()  # Make the player jump when 'w' is pressed
-
-            if event.key == ord(' '):
-                player.shootgun()  # Make the player shoot
-
-        if event.type == pygame.KEYUP:
-            if event.key == pygame.K_LEFT or event.key == ord('a'):
-                player.control(steps, 0)
-            if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                player.control(-steps, 0)
 
-    # Clear previous frames manually to prevent smearing
-    world.fill(BLACK)  # Clear screen before redrawing (now just filling with black)
+def simulate():
+    """
+    Advance the game by one fixed tick.
+    """
+    global sim_time
+    sim_time += TICK
+
+    with profiler.scope('collision'):
+        # Enemies that just landed (or spawned) make earlier predictions stale; redo them from where the spheres are
+        global predicted_version
+        if enemies.version != predicted_version and not enemies.falling:
+            for i in player.projectiles.flying().tolist():
+                schedule_impact(i)
+            predicted_version = enemies.version
+
+        # File what can't be predicted into the collision grid: the player moves as it likes,
+        # and enemies in the air aren't predicted until they land
+        collision_grid.clear()
+        collision_grid.insert(player, player.hitbox)
+        if enemies.falling:
+            for index, rect in enumerate(enemies.rects()):
+                collision_grid.insert(index, rect)
+
+        # Spheres at their scheduled impact hit; the rest only need testing against the unpredictable things
+        flying = player.projectiles.flying()
+        hits = player.projectiles.due(flying)
+        for i, scheduled in zip(flying.tolist(), hits.tolist()):
+            sphere_x, sphere_y = player.projectiles.sphere(i)
+            sphere_rect = pygame.Rect(sphere_x - player.sphere_radius, sphere_y - player.sphere_radius, player.sphere_radius * 2, player.sphere_radius * 2)
+            if scheduled or collision_grid.collide(sphere_rect):
+                print("Hit")
+                particles.emit('explosion', sphere_x, sphere_y, lifetime=16)  # 400 ms
+                particles.emit('spark', sphere_x, sphere_y, count=12, speed=6, lifetime=12, vary=0.5)
+                particles.emit('debris', sphere_x, sphere_y, count=6, speed=4, lifetime=24, gravity=0.5, vary=0.3)
 
-    # Update camera position based on player movement
-    camera.update(player)
+                # Stop the sphere; the frozen trajectory itself is left untouched
+                player.projectiles.stop(i)
+        profiler.count('collision.candidates', collision_grid.candidates)
+        profiler.count('collision.hits', collision_grid.hits)
 
-    # Draw the backdrop using the camera to apply the correct offset
-    world.blit(backdrop, camera.apply(pygame.Rect(0, 0, worldx, worldy)))
-    
-    # Draw the floor (you can adjust the color of the floor)
-    pygame.draw.rect(world, (0, 0, 0), (0, FLOOR_HEIGHT, worldx, worldy - FLOOR_HEIGHT))  # Black floor
-    
-    # Draw all graphs
-    for i, graph in enumerate(player.graphs):
-        # Create a surface to render the graph on
-        graph_surface = pygame.Surface((worldx, worldy), pygame.SRCALPHA)  # Create a surface with alpha channel
+    with profiler.scope('projectiles'):
+        # Move the spheres along and free the slots of finished, faded shots
+        player.projectiles.advance()
+        player.projectiles.recycle(sim_time)
 
-        # Check if one second has passed since the graph was created
-        elapsed_time = time.time() - player.graph_creation_times[i]
-        
-        # If more than 1 second has passed, make the graph transparent
-        if elapsed_time >= 0.4:
-            graph_color = (0, 0, 0, 0)  # Transparent
-        elif elapsed_time >= 0.25:
-            graph_color = (255, 0, 0, 25)  # Transparent
-        elif elapsed_time >= 0.1:
-            graph_color = (255, 255, 0, 50)  # Transparent
-        elif elapsed_time >= 0.05:
-            graph_color = (255, 255, 255, 200) 
-        else:
-            graph_color = (0, 0, 255)  # blue color for the graph
+    with profiler.scope('player.update'):
+        # Update player position and sprite
+        player.update()
 
-        # Draw the graph on the transparent surface
-        transformed_points = [camera.apply(pygame.Rect(x, y, 0, 0)).topleft for x, y in graph]
-        pygame.draw.lines(graph_surface, graph_color, False, transformed_points, 2)
+    with profiler.scope('enemies'):
+        # Move and animate every enemy at once
+        enemies.update()
 
-        # Blit the graph surface to the main world (still with transparency if needed)
-        world.blit(graph_surface, (0, 0))
-        
-        # Draw the spheres that follow the graph
-        if player.sphere_indices[i] < len(graph):
-            sphere_x, sphere_y = graph[player.sphere_indices[i]]
-            sphere_rect = pygame.Rect(sphere_x - player.sphere_radius, sphere_y - player.sphere_radius, player.sphere_radius * 2, player.sphere_radius * 2)
-            sphere_x, sphere_y = camera.apply(pygame.Rect(sphere_x, sphere_y, 0, 0)).topleft  # Apply camera to the sphere
-            sphere_color = [0, 0, 255]  # Blue color for the sphere
-            pygame.draw.circle(world, sphere_color, (int(sphere_x), int(sphere_y)), player.sphere_radius)
-            
-            # check for collision with the player
-            if sphere_rect.colliderect(player.hitbox):
-                print("Hit")
-                explosion = Explosion(sphere_x, sphere_y, player.explosion_frames, duration = 400)
-                player.explosions.add(explosion)
+    with profiler.scope('particles'):
+        # Move every effect along and drop the finished ones
+        particles.update()
 
-                player.graphs[i].pop(player.sphere_indices[i])
 
-                player.sphere_indices[i] = len(player.graphs[i])
-            
-            player.sphere_indices[i] += 1
+def draw_background(surface):
+    """
+    Draw the static scene for the current camera position.
+    """
+    # Clear previous frames manually to prevent smearing
+    surface.fill(BLACK)  # Clear screen before redrawing (now just filling with black)
+
+    # Draw the visible part of the backdrop using the camera to apply the correct offset
+    background.draw(surface, camera)
 
-    # Update player position and sprite
-    player.update()
+    # Draw the chunks of the level that are in view
+    level.draw(surface, camera)
+
+
+def render(alpha):
+    """
+    Draw the current state, interpolated alpha (0 to 1) of the way from the previous tick to the latest one.
+    """
+    # Where the player is between the last two ticks
+    player_rect = player.rect.copy()
+    player_rect.x = round(player.prev_pos[0] + (player.rect.x - player.prev_pos[0]) * alpha)
+    player_rect.y = round(player.prev_pos[1] + (player.rect.y - player.prev_pos[1]) * alpha)
+
+    with profiler.scope('camera.update'):
+        # Update camera position based on player movement
+        camera.update(player_rect)
+        level.stream(camera, world.get_size())  # Get the chunks coming into view ready
+
+    with profiler.scope('backdrop'):
+        # Redraw the static scene if the camera moved, otherwise just repair last frame's areas
+        dirty_renderer.begin(camera.camera.topleft, draw_background)
+
+    with profiler.scope('graphs'):
+        # Draw all live graphs onto the shared trail overlay
+        trail_renderer.begin()
+        for i in player.projectiles.live(oldest_first=True):  # Newest trails end up on top
+            # Fade the graph out as it gets older
+            elapsed_time = sim_time - player.projectiles.spawn_time[i]
+            graph_color = trail_color(elapsed_time)
+
+            # Draw the graph on the overlay (fully transparent graphs are skipped)
+            if graph_color[3] > 0:
+                # Fainter trails are drawn from fewer points
+                outline = shot_shapes.simplified(player.projectiles.shapes[i], trail_tolerance(graph_color))
+                transformed_points = camera.apply_points(outline, player.projectiles.origin[i])
+                for run in camera.cull_lines(transformed_points):  # Only the parts that are on screen
+                    trail_renderer.draw(run, graph_color, 2)
+
+        # Blend all trails onto the world at once, then draw the spheres that follow them on top
+        dirty_renderer.mark(trail_renderer.blit(world))
+        sphere_color = [0, 0, 255]  # Blue color for the sphere
+        for sphere in camera.apply_points(player.projectiles.sphere_positions(alpha)).tolist():  # Apply camera to all spheres at once
+            dirty_renderer.mark(pygame.draw.circle(world, sphere_color, sphere, player.sphere_radius))
 
     # pygame.draw.rect(world, (0, 255, 0), camera.apply(player.hitbox), 2)  # Green hitbox for debugging
 
-    player.explosions.update()
-    player.explosions.draw(world)
+    with profiler.scope('enemies.draw'):
+        dirty_renderer.mark(enemies.draw(world, camera, alpha))
 
-    # Manually draw the player sprite using the camera
-    world.blit(player.image, camera.apply(player))
+    with profiler.scope('particles.draw'):
+        dirty_renderer.mark(particles.draw(world, camera, alpha))
 
-    pygame.display.flip()
-    clock.tick(fps)
+    with profiler.scope('player.draw'):
+        # Manually draw the player sprite using the camera
+        dirty_renderer.mark(world.blit(player.image, camera.apply(player_rect)))
+
+    dirty_renderer.mark(profiler.draw(world))
+
+    with profiler.scope('display.flip'):
+        dirty_renderer.present()
+    if latency is not None:
+        latency.presented()
+
+
+def quit_game():
+    global main
+    pygame.quit()
+    try:
+        sys.exit()
+    finally:
+        main = False
+
+
+def dump_memory():
+    """
+    Print the top allocations so far.
+    Returns:
+        True if they were printed, False if memory isn't being tracked (so the press isn't counted as applied).
+    """
+    if memory is None:
+        return False
+    memory.dump()
+    return True
+
+
+# What each action does; the keys for them come from the bindings
+controls.on('left', press=lambda: player.control(-steps, 0), release=lambda: player.control(steps, 0))
+controls.on('right', press=lambda: player.control(steps, 0), release=lambda: player.control(-steps, 0))
+controls.on('jump', press=player.jump, buffer=JUMP_BUFFER)  # A jump pressed just before landing happens on landing
+controls.on('shoot', press=lambda: player.shootgun(sim_time))
+controls.on('quit', press=quit_game)
+controls.on('profiler', press=profiler.toggle)  # Show or hide the frame-time overlay
+controls.on('memory', press=dump_memory)
+
+
+def handle_event(event, stamp=None):
+    """
+    Apply one pygame event to the game.
+    Args:
+        event (pygame.event.Event): Event to apply.
+        stamp (float): time.perf_counter() it was first seen, for measuring input latency (default is now).
+    """
+    if event.type == pygame.VIDEOEXPOSE:
+        dirty_renderer.invalidate()  # Window was uncovered: redraw everything
+    if event.type == pygame.QUIT:
+        quit_game()
+    controls.dispatch(event, stamp)
+
+
+def poll_assets():
+    """
+    Finish a little of the background asset loading, rebuilding the texture atlas once it's all in if it was stale.
+    """
+    if loader.poll(budget=0.002):
+        loader.save_atlas()
+
+
+def poll_events():
+    """
+    Handle the pending pygame events, recording them if asked to.
+    """
+    global input_seen
+    stamp = time.perf_counter() if input_seen is None else input_seen  # Keys seen during the frame wait came in then
+    input_seen = None
+    for event in pygame.event.get():
+        if recorder is not None:
+            recorder.record(ticks, event)
+        handle_event(event, stamp)
+
+
+def memory_counts():
+    """
+    Count the things that should stay bounded however long the game runs.
+    """
+    return {
+        'projectiles': len(player.projectiles),
+        'projectile_slots': player.projectiles.capacity,
+        'shot_shapes': len(shot_shapes.shapes),
+        'shot_outlines': len(shot_shapes.outlines),
+        'sprites': len(player_list),
+        'particles': len(particles),
+        'particle_slots': len(particles.x),
+        'enemies': len(enemies),
+        'animation_states': len(soldier_animations),
+        'surfaces': cached_surfaces() + soldier_animations.surfaces() + len(level.chunks),
+    }
+
+
+def run_tick():
+    """
+    Apply the replayed input for this tick, if any, then simulate it.
+    """
+    global ticks
+    if replay is not None:
+        for event in replay.events(ticks):
+            handle_event(event)
+    controls.tick()  # Retry buffered presses, e.g. a jump pressed just before landing
+    simulate()
+    ticks += 1
+    if memory is not None:
+        memory.sample(ticks, memory_counts)
+
+
+def running():
+    """
+    Whether the main loop should keep going.
+    """
+    if not main:
+        return False
+    if args.ticks is not None:
+        return ticks < args.ticks
+    if replay is not None:
+        return ticks <= replay.last_tick
+    return True
+
+
+# Memory instrumentation, off unless asked for (started after setup, so only growth while playing is reported)
+memory = None
+if args.memtrack is not None:
+    memory = MemoryTracker(interval=args.memtrack)
+    atexit.register(memory.dump)
+
+# Garbage collection stays out of the frame unless left on automatic (set up last, so setup objects are frozen)
+collector = CollectionSchedule(args.gc)
+
+
+# Main Loop
+if args.headless:
+    # Same simulation, no rendering and no frame cap
+    start_time = time.perf_counter()
+    while running():
+        profiler.begin_frame()
+        with profiler.scope('events'):
+            poll_events()
+        with profiler.scope('assets'):
+            poll_assets()
+        run_tick()
+        with profiler.scope('collect'):
+            collector.idle()
+        profiler.end_frame()
+    elapsed = time.perf_counter() - start_time
+    print(f"Simulated {ticks} ticks in {elapsed:.2f} s ({ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    print(f"Pools: projectile slots {player.projectiles.stats()}")
+    print(f"Particles: {particles.stats()}")
+    print(f"Shot shapes: {shot_shapes.stats()}")
+    print(f"Collision grid: {collision_grid.stats()}")
+    sys.exit()
+
+# The simulation advances in fixed ticks of TICK seconds. Each frame runs as many
+# ticks as the elapsed time asks for (at most MAX_SUBSTEPS), then draws the state
+# interpolated between the last two ticks, so the game speed doesn't depend on the frame rate.
+previous_time = time.perf_counter()
+accumulator = 0.0
+frame_start = previous_time  # When the last frame wait ended
+woken = False  # Whether that wait ended early because of a key
+while running():
+    profiler.begin_frame()
+    with profiler.scope('events'):
+        poll_events()
+    with profiler.scope('assets'):
+        poll_assets()
+
+    if args.uncapped:
+        # One tick, one frame, no waiting
+        run_tick()
+        render(1.0)
+        with profiler.scope('collect'):
+            collector.idle()
+        profiler.end_frame()
+        continue
+
+    current_time = time.perf_counter()
+    accumulator += current_time - previous_time
+    previous_time = current_time
+
+    substeps = 0
+    while accumulator >= TICK and substeps < MAX_SUBSTEPS and running():
+        run_tick()
+        accumulator -= TICK
+        substeps += 1
+    if accumulator >= TICK:
+        accumulator %= TICK  # Too far behind: drop the backlog instead of spiralling
+    if woken and not substeps and running():
+        # Woken early by a key: simulate it now instead of next frame, borrowing the tick from the next frame
+        run_tick()
+        accumulator -= TICK
+
+    render(max(accumulator / TICK, 0.0))
+    with profiler.scope('collect'):
+        collector.idle()  # The frame is on screen; collect before waiting for the next one
+    with profiler.scope('clock.tick'):
+        if args.low_latency or latency is not None:
+            # Wait out the frame watching for keys, to stamp them when they come in (and start early on them)
+            input_seen = wait_for_input(frame_start + 1 / fps, wake=args.low_latency)
+            woken = args.low_latency and input_seen is not None
+            frame_start = time.perf_counter()
+        else:
+            clock.tick(fps)
+    profiler.end_frame()
@@ -0,0 +1,86 @@
+import linecache
+import os
+import tracemalloc
+from collections import deque
+
+_IGNORED = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+class MemoryTracker:
+    """
+    Opt-in memory instrumentation for the main loop.
+    Every interval ticks sample() records the memory traced by tracemalloc and
+    the counts the game reports (live projectiles, sprites, surfaces, ...).
+    A value that went up in every one of the last window samples is flagged
+    as possible retention, once, when it starts growing. dump() prints the
+    allocation sites that grew most since tracking started, and the latest counts.
+    Tracing every allocation makes the game noticeably slower, so only turn it on to investigate.
+    """
+    def __init__(self, interval=400, window=8, frames=1):
+        """
+        Args:
+            interval (int): Ticks between samples (default is 400, 10 seconds at 40 fps).
+            window (int): Samples in a row a value must grow for to be flagged (default is 8).
+            frames (int): Stack frames kept per allocation; each one more slows tracing a lot (default is 1).
+        """
+        if interval < 1 or window < 2:
+            raise ValueError("interval must be at least 1 and window at least 2")
+        self.interval = interval
+        self.window = window
+        self.history = {}  # Name -> last window values
+        self.flagged = set()  # Names currently reported as growing
+        self.samples = 0
+        tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def sample(self, tick, counts=None):
+        """
+        Record a sample if tick is on the interval.
+        Args:
+            tick (int): Simulation ticks run so far.
+            counts (callable): Returns a {name: number} dictionary of things to count; only called when sampling.
+        Returns:
+            Names that have just started growing steadily.
+        """
+        if tick % self.interval:
+            return []
+        self.samples += 1
+        values = {'traced_kb': tracemalloc.get_traced_memory()[0] // 1024}
+        if counts is not None:
+            values.update(counts())
+
+        growing = []
+        for name, value in values.items():
+            history = self.history.setdefault(name, deque(maxlen=self.window))
+            history.append(value)
+            steady = len(history) == self.window and all(a < b for a, b in zip(history, list(history)[1:]))
+            if steady and name not in self.flagged:
+                self.flagged.add(name)
+                growing.append(name)
+                print(f"Memory: {name} grew in each of the last {self.window} samples "
+                      f"({history[0]} -> {history[-1]}), possible leak")
+            elif not steady:
+                self.flagged.discard(name)
+        return growing
+
+    def dump(self, limit=15):
+        """
+        Print the allocation sites that grew most since tracking started, and the latest sampled values.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Memory: {current / 1024:.0f} KiB traced now, {peak / 1024:.0f} KiB at peak, {self.samples} samples")
+        for name, history in self.history.items():
+            note = " (growing)" if name in self.flagged else ""
+            print(f"  {name:<16}{history[-1]:>10}{note}")
+        print(f"Top {limit} allocation sites by growth since tracking started:")
+        for stat in snapshot.compare_to(self.baseline, 'lineno')[:limit]:
+            frame = stat.traceback[0]
+            print(f"  {os.path.relpath(frame.filename)}:{frame.lineno}: {stat.size_diff / 1024:+.1f} KiB "
+                  f"({stat.count_diff:+} blocks), {stat.size / 1024:.1f} KiB in {stat.count} blocks")
@@ -1,55 +1,31 @@
 import time
+import numpy as np
 import pygame
 import sys
 import os
-from math import *
-from enemy import Enemy  # Importing the Enemy class from the enemy.py file
+from trajectory import shot_shapes
+from projectiles import ProjectileStore, FLYING
+from trails import TrailRenderer, trail_color, trail_tolerance
+from camera import Camera
+from levelpack import load_level
+from tilemap import tile_entries
+from background import ParallaxBackground
+from atlas import MANIFEST
+from loader import AssetLoader, REQUIRED, PREFETCH, draw_progress
+from swarm import EnemySwarm
+from controls import InputDispatcher
+from animation import Animator, soldier_entry
 
 # Variables
 worldx = 960
 worldy = 720
 fps = 40
-ani = 4
 world = pygame.display.set_mode([worldx, worldy])
 
 BLUE = (25, 25, 200)
 BLACK = (23, 23, 23)
 WHITE = (254, 254, 254)
 ALPHA = (0, 255, 0)
-FLOOR_HEIGHT = 600  # Floor level (adjust as needed)
-
-# Camera class to handle centering the screen on the player
-class Camera:
-    def __init__(self, width, height):
-        self.camera = pygame.Rect(0, 0, width, height)
-        self.world_size = pygame.Rect(0, 0, 2000, 1000)  # Size of the world (adjust this if needed)
-        self.bounds = pygame.Rect(0, 0, width, height)
-
-    def apply(self, entity):
-        """
-        Moves the entity's rect relative to the camera's position.
-        """
-        if isinstance(entity, pygame.sprite.Sprite):
-            return entity.rect.move(self.camera.topleft)
-        elif isinstance(entity, pygame.Rect):
-            return entity.move(self.camera.topleft)
-        else:
-            raise ValueError("entity must be a pygame.sprite.Sprite or pygame.Rect")
-
-    def update(self, target):
-        """
-        Update the camera's position to follow the target (the player).
-        """
-        x = -target.rect.centerx + int(self.camera.width / 2)
-        y = -target.rect.centery + int(self.camera.height / 2)
-
-        # Keep the camera inside the world bounds
-        x = min(0, x)
-        y = min(0, y)
-        x = max(-(self.world_size.width - self.camera.width), x)
-        y = max(-(self.world_size.height - self.camera.height), y)
-
-        self.camera = pygame.Rect(x, y, self.camera.width, self.camera.height)
 
 # Player class
 class Player(pygame.sprite.Sprite):
@@ -60,58 +36,21 @@ class Player(pygame.sprite.Sprite):
         pygame.sprite.Sprite.__init__(self)
         self.movex = 0
         self.movey = 0
-        self.frame = 0
-        self.images = self.load_animation_frames('images/Soldier_1/Walk.png', 128, 128, 7, scale_factor=2)  # Scale sprite
-        self.image = self.images[0]  # Set the first frame initially
+        self.ticks = 0  # Updates run so far, the clock of the animation
+        self.animation = Animator()  # Idle and Walk load at startup, other states the first time they play
+        self.image = self.animation.frame(self.ticks)
         self.rect = self.image.get_rect()
-        self.rect.x = 100  # Starting X position
-        self.rect.y = FLOOR_HEIGHT - self.rect.height  # Starting Y position (on the floor)
+        self.rect.midbottom = level.spawns('player')[0]  # Start at the level's player spawn
         self.velocity_y = 0  # For gravity
         self.on_ground = False
+        self.move(0, level.rect.height)
 
         self.shooting = False  # Flag to control the shooting action
         self.sphere_radius = 5
-        self.graphs = []  # Store multiple graphs
-        self.sphere_indices = []  # Store the sphere index for each graph
-        self.graph_creation_times = []  # Store the creation time for each graph
+        self.projectiles = ProjectileStore()  # Trajectories, sphere positions and spawn times of live shots
 
         self.facing = 'right'  # New variable to track which direction the character is facing
 
-    def load_animation_frames(self, image_path, frame_width, frame_height, num_frames, scale_factor=2):
-        """
-        Chop the sprite sheet into individual frames and scale them.
-        Args:
-            image_path (str): Path to the sprite sheet image.
-            frame_width (int): Width of each frame in the sprite sheet.
-            frame_height (int): Height of each frame in the sprite sheet.
-            num_frames (int): Number of frames in the sprite sheet.
-            scale_factor (int): Factor by which to scale the frames (default is 2).
-        Returns:
-            List of surfaces containing each frame.
-        """
-        try:
-            sprite_sheet = pygame.image.load(image_path).convert_alpha()  # Load sprite sheet
-        except pygame.error:
-            print(f"Error loading image: {image_path}")
-            sys.exit()  # Exit if image can't be loaded
-
-        frames = []
-        sprite_sheet_width, sprite_sheet_height = sprite_sheet.get_size()
-
-        # Extract frames from sprite sheet
-        for i in range(num_frames):  # Assuming frames are arranged in a single row
-            x = i * frame_width
-            y = 0  # All frames are in the first row
-            frame = sprite_sheet.subsurface(pygame.Rect(x, y, frame_width, frame_height))
-
-            # Scale the frame (increase the size of the sprite)
-            frame = pygame.transform.scale(frame, (frame_width * scale_factor, frame_height * scale_factor))
-
-            frames.append(frame)
-
-        print(f"Loaded {len(frames)} frames from the sprite sheet.")
-        return frames
-
     def control(self, x, y):
         """
         Control player movement
@@ -124,188 +63,203 @@ class Player(pygame.sprite.Sprite):
         Update sprite position.
         Handle gravity and movement.
         """
+        self.ticks += 1
 
         # Apply gravity only if not on the ground
         if not self.on_ground:
             self.velocity_y += 1  # gravity effect
 
-        # Move player with velocity
-        self.rect.x += self.movex
-        self.rect.y += self.velocity_y
-
-        # Prevent going below the floor (and handle jumping)
-        if self.rect.y >= FLOOR_HEIGHT - self.rect.height:
-            self.rect.y = FLOOR_HEIGHT - self.rect.height
-            self.on_ground = True
-        else:
-            self.on_ground = False
+        # Move player with velocity, stopping at solid tiles
+        self.move(self.movex, self.velocity_y)
+        if self.on_ground:
+            self.velocity_y = 0  # Landed
 
-        # Update facing direction based on movement
-        if self.movex < 0:  # Moving left
+        # Face the way it moves, walking while it does and idling otherwise
+        if self.movex < 0:
             self.facing = 'left'
-            self.frame += 1
-            if self.frame >= len(self.images) * ani:
-                self.frame = 0
-            self.image = pygame.transform.flip(self.images[self.frame // ani], True, False)
-        elif self.movex > 0:  # Moving right
+        elif self.movex > 0:
             self.facing = 'right'
-            self.frame += 1
-            if self.frame >= len(self.images) * ani:
-                self.frame = 0
-            self.image = self.images[self.frame // ani]
-        else:  # Idle animation when not moving
-            if self.facing == 'left':  # Keep the left-facing frame if the player was last moving left
-                self.image = self.images[0]  # First frame of the left-facing animation
-                self.image = pygame.transform.flip(self.images[self.frame // ani], True, False)
-            else:  # Keep the right-facing frame if the player was last moving right
-                self.image = self.images[0]  # First frame of the right-facing animation
+        self.animation.set_base('Walk' if self.movex else 'Idle', self.ticks)
+        self.image = self.animation.frame(self.ticks, self.facing == 'left')
+
+    def move(self, dx, dy):
+        """
+        Move the player through the level's tiles.
+        Only the body (the solid part of the sprite, down to the feet) collides.
+        """
+        body = pygame.Rect(self.rect.x + 80, self.rect.y + 110, self.rect.width - 170, self.rect.height - 110)
+        body, self.on_ground, _ = level.move(body, dx, dy)
+        self.rect.x = body.x - 80
+        self.rect.bottom = body.bottom
 
     def jump(self):
         """
         Make the player jump if on the ground
+        Returns:
+            Whether it jumped.
         """
-        if self.on_ground:
-            self.velocity_y = -15  # Jump force
+        if not self.on_ground:
+            return False
+        self.velocity_y = -15  # Jump force
+        return True
 
     def shootgun(self):
         """
         Start shooting and store graph points to follow
         Freeze the plotPoints
         """
-        graph_points = self.drawgraph()  # Generate graph points
-        self.graphs.append(graph_points)  # Store the graph
-        self.sphere_indices.append(0)  # Add sphere index for the new graph
-        self.graph_creation_times.append(time.time())  # Store the creation time of the graph
+        shape, origin = self.drawgraph()  # Look up the graph's shape and where it starts
+        self.projectiles.spawn(shape, origin, time.time())  # Start its sphere
+        self.animation.play('Shot_1', self.ticks)
 
     def drawgraph(self, equationStr="d[0]=sin(50*x)*50"):
-        plotPoints = []
-        for x in range(self.rect.x, self.rect.x + 1000):  # Adjust range as needed
-            d = [0]
-            exec(equationStr)
-            y = d[0]
-            y = -y + self.rect.y + 155  # Adjust Y value to fit the floor
-            plotPoints.append([x, y])
-
+        """
+        Get the shot equation's shape for the way the player faces, and where it starts in front of the player.
+        The shape is cached and shared between shots; add the start to get world points.
+        Returns:
+            (shape, origin): (1000, 2) array of [x, y] relative to the start, and the start's world [x, y].
+        """
+        y = self.rect.y + 155  # Adjust Y value to fit the floor
         if self.facing == 'left':
-            plotPoints = plotPoints[::-1]  # Reverse the list
-            plotPoints = [[x - 1000, y] for x, y in plotPoints]
-        else:
-            plotPoints = [[x + 160, y] for x, y in plotPoints]
+            return shot_shapes.get(equationStr, -1), (self.rect.x - 1, y)  # Mirrored, going left
+        return shot_shapes.get(equationStr, 1), (self.rect.x + 160, y)
+
+def show_loading(done, total):
+    """
+    Draw the loading screen, keeping the window responsive while assets load.
+    """
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+    world.fill(BLACK)
+    draw_progress(world, done, total, WHITE)
+    pygame.display.flip()
 
-        return plotPoints
 
 # Function to draw the graph (Fixed relative to the floor, affected by camera)
 # Setup
-backdrop = pygame.image.load(os.path.join('images', 'Background/Background.png'))
-backdrop = pygame.transform.scale(backdrop, (1920, 1080))
+# Assets load on worker threads; everything but the explosions is on screen from the first frame
+loader = AssetLoader()
+for entry in MANIFEST:
+    loader.request(entry, PREFETCH if entry['kind'] == 'sequence' else REQUIRED)
+for entry in tile_entries():
+    loader.request(entry, REQUIRED)
+for state in ('Idle', 'Walk'):  # The player's looping states; the rest load the first time they play
+    loader.request(soldier_entry('Soldier_1', state), REQUIRED)
+level = load_level(os.path.join('levels', 'level_1.txt'))  # Tiles to stand on, streamed from the packed level in chunks
+loader.wait(REQUIRED, show_loading)
+# Swamp layers from far to near, each scrolling at its own rate
+background = ParallaxBackground([(os.path.join('images', 'Background', 'Layers', f'{layer}.png'), rate)
+                                 for layer, rate in ((1, 0.1), (2, 0.3), (3, 0.5), (4, 0.7), (5, 1.0))],
+                                size=(1778, 1000))
 clock = pygame.time.Clock()
 pygame.init()
 backdropbox = world.get_rect()
 main = True
 
 player = Player()  # spawn player
-enemy = Enemy(x=600, y=100, sprite_path='images/Centipede/Centipede_sneer.png', frame_width=72, frame_height=72, num_frames=4)
+# Every enemy is updated and drawn together
+enemies = EnemySwarm('images/Centipede/Centipede_sneer.png', 72, 72, 4, level)
+for spawn_x, spawn_bottom in level.spawns('enemy'):  # Start at the level's enemy spawns
+    enemies.spawn(spawn_x - enemies.width // 2, spawn_bottom - enemies.height)
 
 player_list = pygame.sprite.Group()
 player_list.add(player)
-enemy_list = pygame.sprite.Group()
-enemy_list.add(enemy)
 steps = 10
 
 # Camera setup
-camera = Camera(worldx, worldy)
+camera = Camera(worldx, worldy, level.rect.size)
+
+# All graph trails are drawn onto one overlay and blended once per frame
+trail_renderer = TrailRenderer((worldx, worldy))
+
+
+def quit_game():
+    global main
+    pygame.quit()
+    try:
+        sys.exit()
+    finally:
+        main = False
+
+
+# What each action does; the keys for them come from controls.DEFAULT_BINDINGS
+controls = InputDispatcher()
+controls.on('left', press=lambda: player.control(-steps, 0), release=lambda: player.control(steps, 0))
+controls.on('right', press=lambda: player.control(steps, 0), release=lambda: player.control(-steps, 0))
+controls.on('jump', press=player.jump, buffer=4)  # A jump pressed just before landing happens on landing
+controls.on('shoot', press=player.shootgun)
+controls.on('quit', press=quit_game)
 
 # Main Loop
 while main:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
-            pygame.quit()
-            try:
-                sys.exit()
-            finally:
-                main = False
-
-        if event.type == pygame.KEYDOWN:
-            if event.key == ord('q'):
-                pygame.quit()
-                try:
-                    sys.exit()
-                finally:
-                    main = False
-            if event.key == pygame.K_LEFT or event.key == ord('a'):
-                player.control(-steps, 0)
-            if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                player.control(steps, 0)
-            if event.key == pygame.K_UP or event.key == ord('w'):
-                player.jump()  # Make the player jump when 'w' is pressed
-
-            if event.key == ord(' '):
-                player.shootgun()  # Make the player shoot
-
-        if event.type == pygame.KEYUP:
-            if event.key == pygame.K_LEFT or event.key == ord('a'):
-                player.control(steps, 0)
-            if event.key == pygame.K_RIGHT or event.key == ord('d'):
-                player.control(-steps, 0)
+            quit_game()
+        controls.dispatch(event)
+    controls.tick()  # Retry buffered presses
+
+    # Finish a little of the background loading, rebuilding the texture atlas once it's all in if it was stale
+    if loader.poll(budget=0.002):
+        loader.save_atlas()
 
     # Clear previous frames manually to prevent smearing
     world.fill(BLACK)  # Clear screen before redrawing (now just filling with black)
 
     # Update camera position based on player movement
     camera.update(player)
+    level.stream(camera, world.get_size())  # Get the chunks coming into view ready
 
-    # Draw the backdrop using the camera to apply the correct offset
-    world.blit(backdrop, camera.apply(pygame.Rect(0, 0, worldx, worldy)))
+    # Draw the visible part of every background layer
+    background.draw(world, camera)
     
-    # Draw the floor (you can adjust the color of the floor)
-    pygame.draw.rect(world, (0, 0, 0), (0, FLOOR_HEIGHT, worldx, worldy - FLOOR_HEIGHT))  # Black floor
+    # Draw the chunks of the level that are in view
+    level.draw(world, camera)
     
-    # Draw all graphs
-    for i, graph in enumerate(player.graphs):
-        # Create a surface to render the graph on
-        graph_surface = pygame.Surface((worldx, worldy), pygame.SRCALPHA)  # Create a surface with alpha channel
-
-        # Check if one second has passed since the graph was created
-        elapsed_time = time.time() - player.graph_creation_times[i]
-        
-        # If more than 1 second has passed, make the graph transparent
-        if elapsed_time >= 0.4:
-            graph_color = (0, 0, 0, 0)  # Transparent
-        elif elapsed_time >= 0.25:
-            graph_color = (255, 0, 0, 25)  # Transparent
-        elif elapsed_time >= 0.1:
-            graph_color = (255, 255, 0, 50)  # Transparent
-        elif elapsed_time >= 0.05:
-            graph_color = (255, 255, 255, 200) 
-        else:
-            graph_color = (0, 0, 255)  # blue color for the graph
-
-        # Draw the graph on the transparent surface
-        transformed_points = [camera.apply(pygame.Rect(x, y, 0, 0)).topleft for x, y in graph]
-        pygame.draw.lines(graph_surface, graph_color, False, transformed_points, 2)
-
-        # Blit the graph surface to the main world (still with transparency if needed)
-        world.blit(graph_surface, (0, 0))
-        
-        # Draw the spheres that follow the graph
-        if player.sphere_indices[i] < len(graph):
-            sphere_x, sphere_y = graph[player.sphere_indices[i]]
-            sphere_x, sphere_y = camera.apply(pygame.Rect(sphere_x, sphere_y, 0, 0)).topleft  # Apply camera to the sphere
-            sphere_color = [0, 0, 255]  # Blue color for the sphere
-            pygame.draw.circle(world, sphere_color, (int(sphere_x), int(sphere_y)), player.sphere_radius)
-            player.sphere_indices[i] += 1
+    # Draw all live graphs onto the shared trail overlay
+    now = time.time()
+    trail_renderer.begin()
+    spheres = []  # World positions of the spheres to draw over the trails
+    for i in player.projectiles.live(oldest_first=True):  # Newest trails end up on top
+        # Fade the graph out as it gets older
+        elapsed_time = now - player.projectiles.spawn_time[i]
+        graph_color = trail_color(elapsed_time)
+
+        # Draw the graph on the overlay (fully transparent graphs are skipped)
+        if graph_color[3] > 0:
+            # Fainter trails are drawn from fewer points
+            outline = shot_shapes.simplified(player.projectiles.shapes[i], trail_tolerance(graph_color))
+            transformed_points = camera.apply_points(outline, player.projectiles.origin[i])
+            for run in camera.cull_lines(transformed_points):  # Only the parts that are on screen
+                trail_renderer.draw(run, graph_color, 2)
+
+        # Place the spheres that follow the graph
+        if player.projectiles.state[i] == FLYING:
+            sphere_x, sphere_y = player.projectiles.sphere(i)
+            spheres.append((sphere_x, sphere_y))
+
+    # Blend all trails onto the world at once, then draw the spheres on top
+    trail_renderer.blit(world)
+    sphere_color = [0, 0, 255]  # Blue color for the sphere
+    for sphere in camera.apply_points(np.reshape(spheres, (-1, 2))).tolist():  # Apply camera to all spheres at once
+        pygame.draw.circle(world, sphere_color, sphere, player.sphere_radius)
+
+    # Move the spheres along and free the slots of finished, faded shots
+    player.projectiles.advance()
+    player.projectiles.recycle(now)
 
     # Update player position and sprite
     player.update()
 
-    # Update enemy position and sprite
-    enemy.update()
+    # Update every enemy's position and animation at once
+    enemies.update()
 
     # Manually draw the player sprite using the camera
     world.blit(player.image, camera.apply(player))
     
-    # Manually draw the enemy sprite using the camera
-    world.blit(enemy.image, camera.apply(enemy))
+    # Draw the enemies that are on screen using the camera
+    enemies.draw(world, camera)
 
     pygame.display.flip()
     clock.tick(fps)
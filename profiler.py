@@ -0,0 +1,186 @@
+import csv
+import gc
+from array import array
+import json
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+import pygame
+
+_NO_SCOPE = nullcontext()  # Shared do-nothing scope handed out while profiling is off
+
+
+def _gc_collections():
+    return sum(generation['collections'] for generation in gc.get_stats())
+
+
+class _Scope:
+    """
+    Times one phase and adds it to the current frame.
+    """
+    __slots__ = ('profiler', 'index', 'start')
+
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.current[self.index] += (time.perf_counter() - self.start) * 1000
+
+
+class FrameProfiler:
+    """
+    Per-phase frame timing for the main loop.
+    Wrap each phase in `with profiler.scope('name'):` and call begin_frame()/end_frame()
+    around every frame. While disabled, scope() returns a shared no-op and nothing is recorded.
+    Traced frames also record the net change in allocated memory blocks and the number of
+    garbage collections that ran during the frame. The block count includes a small constant
+    from the timing scopes themselves (about one block per scope), so compare it between runs.
+    """
+    def __init__(self, enabled=False, window=240, trace=False):
+        self.enabled = enabled or trace
+        self.overlay = enabled  # Draw the stats on screen
+        self.tracing = trace  # Keep every frame for export
+        self.frames = deque(maxlen=window)  # Rolling frame times in ms
+        self.phases = {}  # Phase name -> rolling times in ms
+        self.phase_index = {}  # Phase name -> slot in current
+        self.current = array('d')  # Phase times of the frame in progress, in ms (plain doubles, no objects)
+        self.trace = []  # One row per frame while tracing
+        self.counts = {}  # Counter name -> total of the frame in progress, while tracing
+        self.frame_start = 0.0
+        self.blocks_start = 0
+        self.gc_start = 0
+        self.font = None
+
+    def toggle(self):
+        """
+        Show or hide the overlay. Timing runs while the overlay is shown or a trace is being recorded.
+        The change takes effect at the next begin_frame(), so a frame is never timed from halfway through.
+        """
+        self.overlay = not self.overlay
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NO_SCOPE
+        index = self.phase_index.get(name)
+        if index is None:
+            index = self.phase_index[name] = len(self.phase_index)
+            self.phases[name] = deque(maxlen=self.frames.maxlen)
+            self.current.append(0.0)
+        return _Scope(self, index)
+
+    def count(self, name, value):
+        """
+        Add to a per-frame counter (e.g. collision tests) recorded in the trace rows next to the phase times.
+        """
+        if self.tracing:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def begin_frame(self):
+        enabled = self.overlay or self.tracing
+        if enabled and not self.enabled:
+            # Turned back on: drop the frames of the last session rather than mix them with this one
+            self.frames.clear()
+            for values in self.phases.values():
+                values.clear()
+        self.enabled = enabled
+        if self.enabled:
+            for i in range(len(self.current)):
+                self.current[i] = 0.0
+            self.counts.clear()
+            if self.tracing:
+                self.gc_start = _gc_collections()
+            self.frame_start = time.perf_counter()
+            if self.tracing:
+                self.blocks_start = sys.getallocatedblocks()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        end = time.perf_counter()
+        if self.tracing:
+            blocks = sys.getallocatedblocks() - self.blocks_start
+            collections = _gc_collections() - self.gc_start
+        frame_time = (end - self.frame_start) * 1000
+        self.frames.append(frame_time)
+        ran = [(name, self.current[index]) for name, index in self.phase_index.items() if self.current[index]]
+        for name, elapsed in ran:
+            self.phases[name].append(elapsed)
+        if self.tracing:
+            row = {'frame': len(self.trace), 'frame_ms': round(frame_time, 4), 'alloc_blocks': blocks, 'gc': collections}
+            row.update((name, round(elapsed, 4)) for name, elapsed in ran)
+            row.update(self.counts)
+            self.trace.append(row)
+
+    def percentiles(self, values=None, points=(50, 95, 99)):
+        """
+        Return the given percentiles of the rolling frame times (or of values), in ms.
+        """
+        values = self.frames if values is None else values
+        if not values:
+            return [0.0] * len(points)
+        return list(np.percentile(np.fromiter(values, dtype=float), points))
+
+    def summary(self):
+        """
+        Return frame and per-phase percentiles of the rolling window as a dictionary.
+        """
+        p50, p95, p99 = self.percentiles()
+        stats = {'frame': {'p50': p50, 'p95': p95, 'p99': p99}}
+        for name, values in self.phases.items():
+            if not values:
+                continue
+            p50, p95, p99 = self.percentiles(values)
+            stats[name] = {'p50': p50, 'p95': p95, 'p99': p99}
+        return stats
+
+    def draw(self, surface):
+        """
+        Draw the rolling stats in the top left corner when the overlay is on.
+        Returns:
+            The area drawn on, or None.
+        """
+        if not self.overlay or not self.frames:
+            return None
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+
+        p50, p95, p99 = self.percentiles()
+        lines = [f"frame  p50 {p50:5.2f}  p95 {p95:5.2f}  p99 {p99:5.2f} ms"]
+        for name, values in self.phases.items():
+            if not values:
+                continue
+            p50, p95, p99 = self.percentiles(values)
+            lines.append(f"{name:<16} p50 {p50:5.2f}  p95 {p95:5.2f} ms")
+
+        y = 5
+        area = None
+        for line in lines:
+            text = self.font.render(line, True, (255, 255, 255), (0, 0, 0))
+            rect = surface.blit(text, (5, y))
+            area = rect if area is None else area.union(rect)
+            y += text.get_height()
+        return area
+
+    def export(self, path):
+        """
+        Write the recorded trace. A .json path gets the rows plus a summary; anything else is written as CSV.
+        """
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'frames': self.trace}, f, indent=1)
+            return
+
+        columns = ['frame', 'frame_ms', 'alloc_blocks', 'gc']
+        for row in self.trace:
+            columns.extend(name for name in row if name not in columns)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+            writer.writeheader()
+            writer.writerows(self.trace)
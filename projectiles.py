@@ -0,0 +1,205 @@
+import numpy as np
+
+TRAIL_LIFETIME = 0.4  # Seconds until a trail has fully faded out
+
+# Slot states
+FREE = 0  # Slot can be reused by the next shot
+FLYING = 1  # Sphere is still travelling along its trajectory
+SPENT = 2  # Sphere has finished (end of path or hit), trail may still be fading
+
+
+class ProjectileStore:
+    """
+    Fixed-size struct-of-arrays store for live projectiles.
+    Slot i owns row i of every buffer: its shot shape and start point, the
+    sphere cursor, its spawn time and its state. The shape is shared with every
+    other shot of the same equation and direction (see ShapeCache), so firing
+    copies no points; the start point is added as the sphere advances.
+    Shapes are kept at full detail, one sample per pixel, because the sphere
+    steps through every sample. Trails are drawn from simplified copies that
+    ShapeCache.simplified() works out once per shape and level of detail
+    (see trails.trail_tolerance).
+    The slots are the pool of projectile records: acquire() hands out a free
+    one (a hit) or grows the buffers when none is left (a miss), and
+    release() gives one back. recycle() releases every slot whose sphere is
+    done and whose trail has faded, so memory stays flat however long the
+    session runs.
+
+    A shot's path is fixed once fired, so hits on anything predictable can be
+    worked out up front: impact[slot] is the sample the sphere is scheduled to
+    hit something at (its length if nothing), and due() lists the spheres
+    that have got there.
+    """
+    def __init__(self, capacity=32, lifetime=TRAIL_LIFETIME):
+        self.lifetime = lifetime
+        self.shapes = [None] * capacity  # Shot shape of each slot, relative to its start point
+        self.origin = np.zeros((capacity, 2), dtype=float)  # World [x, y] each shot starts at
+        self.length = np.zeros(capacity, dtype=np.int32)  # Samples in each shape
+        self.impact = np.zeros(capacity, dtype=np.int32)  # Sample each sphere is scheduled to hit something at
+        self.cursor = np.zeros(capacity, dtype=np.int32)  # Sample index of each sphere
+        self.position = np.zeros((capacity, 2), dtype=float)  # World [x, y] of each sphere, at the cursor
+        self.previous = np.zeros((capacity, 2), dtype=float)  # World [x, y] of each sphere one sample back
+        self.spawn_time = np.zeros(capacity, dtype=float)  # time.time() when the shot was fired
+        self.state = np.full(capacity, FREE, dtype=np.uint8)
+        self.free_slots = list(range(capacity - 1, -1, -1))  # Stack of free slots, lowest index on top
+        self.hits = 0  # Shots that reused a free slot
+        self.misses = 0  # Shots that found every slot taken and had to grow the buffers
+
+    @property
+    def capacity(self):
+        return len(self.state)
+
+    def __len__(self):
+        return self.capacity - len(self.free_slots)
+
+    def _grow(self):
+        """
+        Double the capacity when every slot is in use.
+        """
+        old = self.capacity
+        new = old * 2
+        self.shapes.extend([None] * old)
+        self.origin = np.concatenate([self.origin, np.zeros((old, 2), dtype=float)])
+        self.length = np.concatenate([self.length, np.zeros(old, dtype=np.int32)])
+        self.impact = np.concatenate([self.impact, np.zeros(old, dtype=np.int32)])
+        self.cursor = np.concatenate([self.cursor, np.zeros(old, dtype=np.int32)])
+        self.position = np.concatenate([self.position, np.zeros((old, 2), dtype=float)])
+        self.previous = np.concatenate([self.previous, np.zeros((old, 2), dtype=float)])
+        self.spawn_time = np.concatenate([self.spawn_time, np.zeros(old, dtype=float)])
+        self.state = np.concatenate([self.state, np.full(old, FREE, dtype=np.uint8)])
+        self.free_slots.extend(range(new - 1, old - 1, -1))
+
+    def acquire(self, now):
+        """
+        Take a free slot for a new shot, growing the buffers if every slot is in use.
+        The caller fills in its shape and start point; spawn() does both.
+        Args:
+            now (float): Spawn time in seconds.
+        Returns:
+            The slot index of the projectile.
+        """
+        if self.free_slots:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._grow()
+        slot = self.free_slots.pop()
+        self.cursor[slot] = 0
+        self.spawn_time[slot] = now
+        self.state[slot] = FLYING
+        return slot
+
+    def release(self, slot):
+        """
+        Give a slot back for reuse straight away, trail and all.
+        """
+        if self.state[slot] == FREE:
+            raise ValueError(f"slot {slot} is not in use")
+        self.state[slot] = FREE
+        self.shapes[slot] = None  # Let the cache drop the shape
+        self.free_slots.append(slot)
+
+    def spawn(self, shape, origin, now):
+        """
+        Start a new shot's sphere at the first sample of its shape.
+        Args:
+            shape (ndarray): (samples, 2) array of [x, y] points relative to the start, kept by reference.
+            origin: World [x, y] the shot starts at.
+            now (float): Spawn time in seconds.
+        Returns:
+            The slot index of the projectile.
+        """
+        slot = self.acquire(now)
+        self.shapes[slot] = shape
+        self.origin[slot] = origin
+        self.length[slot] = self.impact[slot] = len(shape)
+        self.position[slot] = self.previous[slot] = shape[0] + self.origin[slot]
+        return slot
+
+    def stats(self):
+        return f"{self.hits} hits / {self.misses} misses"
+
+    def live(self, oldest_first=False):
+        """
+        Return the indices of all occupied slots.
+        Args:
+            oldest_first (bool): Order them by spawn time instead of by slot; recycled
+                low slots hold the newest shots (default is False).
+        """
+        slots = np.flatnonzero(self.state != FREE)
+        if oldest_first:
+            slots = slots[np.argsort(self.spawn_time[slots], kind='stable')]
+        return slots
+
+    def flying(self):
+        """
+        Return the indices of the slots whose sphere is still travelling.
+        """
+        return np.flatnonzero(self.state == FLYING)
+
+    def due(self, slots):
+        """
+        Return a bool array telling which of the given slots' spheres have reached their scheduled impact.
+        """
+        return self.cursor[slots] >= self.impact[slots]
+
+    def remaining(self, slot):
+        """
+        Return the world points the sphere in the given slot has still to visit, starting with the current one.
+        """
+        return self.shapes[slot][self.cursor[slot]:] + self.origin[slot]
+
+    def path(self, slot):
+        """
+        Return the world points of the shot in the given slot, as a new array.
+        """
+        return self.shapes[slot] + self.origin[slot]
+
+    def sphere(self, slot):
+        """
+        Return the current [x, y] of the sphere in the given slot.
+        """
+        return self.position[slot]
+
+    def sphere_positions(self, alpha=1.0):
+        """
+        Return the positions of all flying spheres as an (N, 2) array,
+        interpolated alpha (0 to 1) of the way from their previous sample to their current one.
+        """
+        slots = self.flying()
+        previous = self.previous[slots]
+        return previous + (self.position[slots] - previous) * alpha
+
+    def stop(self, slot):
+        """
+        Stop the sphere in the given slot (e.g. after a hit). The trail keeps fading.
+        """
+        self.state[slot] = SPENT
+
+    def advance(self):
+        """
+        Move every flying sphere one sample along its trajectory.
+        """
+        flying = np.flatnonzero(self.state == FLYING)
+        if not len(flying):
+            return
+        self.cursor[flying] += 1
+        finished = self.cursor[flying] >= self.length[flying]
+        self.state[flying[finished]] = SPENT
+        moving = flying[~finished]
+
+        # Shots share a handful of shapes; look up the spheres of each shape in one go
+        self.previous[moving] = self.position[moving]
+        groups = {}
+        for slot in moving.tolist():
+            groups.setdefault(id(self.shapes[slot]), []).append(slot)
+        for slots in groups.values():
+            self.position[slots] = self.shapes[slots[0]][self.cursor[slots]] + self.origin[slots]
+
+    def recycle(self, now):
+        """
+        Release every slot whose sphere is done and whose trail has faded out.
+        """
+        done = np.flatnonzero((self.state == SPENT) & (now - self.spawn_time >= self.lifetime))
+        for slot in reversed(done.tolist()):  # Lowest slot ends up on top of the free stack
+            self.release(slot)
@@ -0,0 +1,70 @@
+import struct
+from collections import defaultdict
+
+import pygame
+
+MAGIC = b'INP1'
+RECORD = struct.Struct('<IBI')  # Simulation tick, event kind, key code: 9 bytes per event
+
+# Event kinds as stored on disk
+KEY_DOWN = 0
+KEY_UP = 1
+_KINDS = {pygame.KEYDOWN: KEY_DOWN, pygame.KEYUP: KEY_UP}
+_EVENT_TYPES = {KEY_DOWN: pygame.KEYDOWN, KEY_UP: pygame.KEYUP}
+
+
+def write_recording(path, records):
+    """
+    Write (tick, kind, key) records to a recording file.
+    """
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        for tick, kind, key in records:
+            f.write(RECORD.pack(tick, kind, key))
+
+
+def read_recording(path):
+    """
+    Read the (tick, kind, key) records of a recording file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an input recording")
+    return list(RECORD.iter_unpack(data[len(MAGIC):]))
+
+
+class InputRecorder:
+    """
+    Collect key presses and releases stamped with the simulation tick they apply before.
+    """
+    def __init__(self):
+        self.records = []
+
+    def record(self, tick, event):
+        if event.type in _KINDS:
+            self.records.append((tick, _KINDS[event.type], event.key))
+
+    def save(self, path):
+        write_recording(path, self.records)
+
+
+class InputReplay:
+    """
+    Hand recorded key events back, tick by tick, as pygame events.
+    """
+    def __init__(self, records):
+        self.by_tick = defaultdict(list)
+        for tick, kind, key in records:
+            self.by_tick[tick].append(pygame.event.Event(_EVENT_TYPES[kind], key=key, mod=0, unicode='', scancode=0))
+        self.last_tick = max(self.by_tick, default=-1)
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_recording(path))
+
+    def events(self, tick):
+        """
+        Return the events to apply before the given tick is simulated.
+        """
+        return self.by_tick.get(tick, [])
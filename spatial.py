@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+import pygame
+
+
+class SpatialHash:
+    """
+    Uniform grid over world coordinates for finding collision candidates.
+    Every entity is filed under each cell its rect overlaps, so a query only
+    tests the entities sharing a cell with it instead of every entity.
+    """
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.candidates = 0  # Rect tests done since the last clear
+        self.hits = 0  # Tests that actually collided since the last clear
+        self.total_candidates = 0  # The same, over every tick so far
+        self.total_hits = 0
+
+    def _cells(self, rect):
+        """
+        Yield the (column, row) of every cell the rect overlaps.
+        """
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield cx, cy
+
+    def clear(self):
+        """
+        Empty the grid and reset the per-frame counters. Call once per tick before inserting.
+        """
+        self.cells.clear()
+        self.candidates = 0
+        self.hits = 0
+
+    def insert(self, entity, rect):
+        """
+        File an entity under every cell its rect overlaps.
+        """
+        rect = pygame.Rect(rect)
+        for cell in self._cells(rect):
+            self.cells[cell].append((entity, rect))
+
+    def query(self, rect):
+        """
+        Return the (entity, rect) pairs sharing a cell with the rect, each once.
+        """
+        rect = pygame.Rect(rect)
+        found = []
+        seen = set()
+        for cell in self._cells(rect):
+            for entry in self.cells.get(cell, ()):
+                if id(entry[0]) not in seen:
+                    seen.add(id(entry[0]))
+                    found.append(entry)
+        return found
+
+    def collide(self, rect):
+        """
+        Return the entities whose rect collides with the given rect.
+        """
+        rect = pygame.Rect(rect)
+        candidates = self.query(rect)
+        hits = [entity for entity, entity_rect in candidates if rect.colliderect(entity_rect)]
+        self.candidates += len(candidates)
+        self.hits += len(hits)
+        self.total_candidates += len(candidates)
+        self.total_hits += len(hits)
+        return hits
+
+    def stats(self):
+        return f"{self.total_hits} hits / {self.total_candidates} candidates tested"
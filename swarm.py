@@ -0,0 +1,249 @@
+import numpy as np
+import pygame
+
+from assets import load_sheet
+
+
+class EnemySwarm:
+    """
+    Struct-of-arrays store for many enemies sharing one sprite sheet.
+    Enemy i owns element i of every array: its position, velocity, patrol
+    bounds, ground level and the tick its animation started. update() moves
+    all of them in a few array operations (skipping gravity once everyone has
+    landed) and draw() picks the animation frames of the visible ones only and
+    blits them in one call, so the cost per frame barely depends on how many
+    enemies there are.
+
+    Like Enemy, each one falls to its ground level and walks back and forth
+    between its bounds. The level is only looked at when an enemy spawns: its
+    ground level and bounds are narrowed to the stretch of floor it can walk.
+
+    Once everyone has landed the patrols are fully predictable, so patrol()
+    and first_hit() can tell where enemies will be without running updates.
+    version changes whenever that stops holding (an enemy spawns or is removed)
+    and when the last one lands, so predictions made before can be redone.
+    """
+    # Per-enemy arrays, grown and compacted together
+    _arrays = ('x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'left_bound', 'right_bound', 'ground', 'start_tick')
+
+    def __init__(self, sprite_path, frame_width, frame_height, num_frames, level, scale_factor=2, capacity=16):
+        """
+        Args:
+            sprite_path (str): Sprite sheet shared by every enemy (frames face left).
+            frame_width (int): Width of each frame in the sprite sheet.
+            frame_height (int): Height of each frame in the sprite sheet.
+            num_frames (int): Number of frames in the sprite sheet.
+            level (TileMap): Tile map the enemies walk on.
+            scale_factor (int): Factor by which to scale the frames (default is 2).
+            capacity (int): Enemies to make room for up front; grows as needed (default is 16).
+        """
+        sheet = load_sheet(sprite_path, frame_width, frame_height, num_frames, scale_factor)
+        self.num_frames = len(sheet.frames)
+        self.images = sheet.frames + sheet.flipped  # Frame i facing left, frame num_frames + i facing right
+        self.width, self.height = sheet.frames[0].get_size()
+        self.level = level
+
+        self.gravity = 0.5  # How much gravity affects the enemies each tick
+        self.animation_speed = 20  # Ticks per animation frame
+
+        self.count = 0
+        self.ticks = 0  # Updates run so far, the clock of every animation
+        self.falling = False  # Whether any enemy is still in the air
+        self.version = 0  # Bumped when enemies spawn, are removed or all land, invalidating predictions
+        self.x = np.zeros(capacity)  # Top left of each enemy's rect
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)  # Position before the last update, for interpolated drawing
+        self.prev_y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.left_bound = np.zeros(capacity)  # Range of x each enemy patrols
+        self.right_bound = np.zeros(capacity)
+        self.ground = np.zeros(capacity)  # y the bottom of each enemy stops at
+        self.start_tick = np.zeros(capacity, dtype=np.int64)  # Tick each enemy's animation started at
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        """
+        Double the capacity of every array.
+        """
+        for name in self._arrays:
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+
+    def spawn(self, x, y, left_bound=100, right_bound=600, speed=2):
+        """
+        Add an enemy with its top left at (x, y), patrolling between the bounds.
+        Args:
+            x (int): Starting x.
+            y (int): Starting y; the enemy falls from here to the ground below.
+            left_bound (int): Leftmost x of the patrol (default is 100).
+            right_bound (int): Rightmost x of the patrol (default is 600).
+            speed (float): Horizontal speed, starting to the right (default is 2).
+        Returns:
+            Index of the enemy.
+        """
+        if self.count == len(self.x):
+            self._grow()
+        i = self.count
+        self.count += 1
+
+        # Find the floor below and the part of it that can be walked
+        rect, _, _ = self.level.move(pygame.Rect(x, y, self.width, self.height), 0, self.level.rect.height)
+        left, right = self.level.walkway(rect, left_bound, right_bound)
+
+        self.x[i] = self.prev_x[i] = min(max(x, left), right)
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i] = speed
+        self.vy[i] = 0
+        self.left_bound[i] = left
+        self.right_bound[i] = right
+        self.ground[i] = rect.bottom
+        self.start_tick[i] = self.ticks
+        self.falling = True
+        self.version += 1
+        return i
+
+    def remove(self, i):
+        """
+        Remove an enemy by moving the last one into its place.
+        """
+        last = self.count - 1
+        for name in self._arrays:
+            array = getattr(self, name)
+            array[i] = array[last]
+        self.count = last
+        self.version += 1
+
+    def update(self):
+        """
+        Move every enemy by one tick.
+        """
+        n = self.count
+        self.ticks += 1
+        x, vx = self.x[:n], self.vx[:n]
+        self.prev_x[:n] = x
+
+        if self.falling:
+            # Gravity, landing on the ground level
+            y, vy = self.y[:n], self.vy[:n]
+            self.prev_y[:n] = y
+            lowest = self.ground[:n] - self.height
+            vy += self.gravity * (y < lowest)
+            y += vy
+            np.minimum(y, lowest, out=y)
+            vy *= y < lowest
+            self.falling = bool(vy.any())
+            if not self.falling:
+                self.version += 1  # Everyone is on the ground: the patrols can be predicted from here
+
+        # Walk, turning around at the patrol bounds
+        x += vx
+        left, right = self.left_bound[:n], self.right_bound[:n]
+        np.copysign(vx, np.where(x <= left, 1.0, np.where(x >= right, -1.0, vx)), out=vx)
+        np.maximum(x, left, out=x)
+        np.minimum(x, right, out=x)
+
+    def patrol(self, steps, which=None):
+        """
+        Predict where landed enemies will be after some more updates, without moving them.
+        Follows update() exactly: walk, turn around on reaching a bound, stop at it.
+        Args:
+            steps: 1D array of update counts from now.
+            which: Indices of the enemies to predict (default is all of them).
+        Returns:
+            (enemies, len(steps)) array of x.
+        """
+        which = slice(self.count) if which is None else which
+        x, v = self.x[which, None], self.vx[which, None]
+        left, right = self.left_bound[which, None], self.right_bound[which, None]
+        k = np.asarray(steps)[None, :]
+        speed = np.abs(v)
+        pace = np.where(speed > 0, speed, 1.0)  # Still enemies are handled at the end
+
+        # Updates to get to the bound it's walking towards, then to walk from one bound to the other
+        first = np.maximum(np.ceil(np.where(v > 0, right - x, x - left) / pace), 1)
+        legs = np.ceil((right - left) / pace)
+        on_first = np.where(v > 0, np.minimum(x + speed * k, right), np.maximum(x - speed * k, left))
+
+        # After that it cycles left bound -> right bound -> left bound, 2 * legs updates per round
+        phase = (k - first + np.where(v > 0, legs, 0)) % np.maximum(2 * legs, 1)
+        cycling = np.where(phase <= legs, np.minimum(left + speed * phase, right),
+                           np.maximum(right - speed * (phase - legs), left))
+        return np.where(speed > 0, np.where(k <= first, on_first, cycling), x)
+
+    def first_hit(self, points, radius):
+        """
+        Predict the first point of a path that will overlap an enemy, when the path is followed
+        one point per update starting now. Only valid once every enemy has landed (falling is False).
+        Args:
+            points: (K, 2) array of sphere centres in world coordinates.
+            radius (float): Radius of the sphere.
+        Returns:
+            Index of the first point that hits, or None.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        n = self.count
+        if not n or not len(points):
+            return None
+        px, py = points[:, 0], points[:, 1]
+
+        # Only enemies whose height and patrol range the path crosses at all
+        y = self.y[:n]
+        near = np.flatnonzero((y < py.max() + radius) & (y + self.height > py.min() - radius)
+                              & (self.left_bound[:n] < px.max() + radius)
+                              & (self.right_bound[:n] + self.width > px.min() - radius))
+        if not len(near):
+            return None
+
+        # Only the points passing through where those enemies can be, each tested at the update it is reached on
+        y = y[near]
+        steps = np.flatnonzero((px > self.left_bound[near].min() - radius)
+                               & (px < self.right_bound[near].max() + self.width + radius)
+                               & (py > y.min() - radius) & (py < y.max() + self.height + radius))
+        if not len(steps):
+            return None
+        x = self.patrol(steps, near)
+        px, py, y = px[steps], py[steps], y[:, None]
+        hits = ((x < px + radius) & (x + self.width > px - radius)
+                & (y < py + radius) & (y + self.height > py - radius)).any(axis=0)
+        hit = np.flatnonzero(hits)
+        return int(steps[hit[0]]) if len(hit) else None
+
+    def rects(self):
+        """
+        Return the world (x, y, width, height) of every enemy, e.g. to file them in a SpatialHash.
+        """
+        n = self.count
+        return [(x, y, self.width, self.height)
+                for x, y in zip(self.x[:n].astype(np.int32).tolist(), self.y[:n].astype(np.int32).tolist())]
+
+    def draw(self, surface, camera, alpha=1.0):
+        """
+        Blit every enemy that is on screen in one call.
+        Args:
+            surface (pygame.Surface): Surface to draw on.
+            camera (Camera): Camera giving the screen offset.
+            alpha (float): How far to interpolate from the previous tick to the latest one (default is 1).
+        Returns:
+            List of the screen rects drawn.
+        """
+        n = self.count
+        offset_x, offset_y = camera.camera.topleft
+        screen_x = np.round(self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * alpha).astype(np.int32) + offset_x
+        screen_y = np.round(self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha).astype(np.int32) + offset_y
+        view_width, view_height = surface.get_size()
+        visible = np.flatnonzero((screen_x < view_width) & (screen_x + self.width > 0)
+                                 & (screen_y < view_height) & (screen_y + self.height > 0))
+        if not len(visible):
+            return []
+
+        # Moving enemies step through their frames, still ones show the first frame.
+        # Frames face left in the sheet; right-moving enemies use the mirrored copies.
+        vx = self.vx[visible]
+        frame = (self.ticks - self.start_tick[visible]) // self.animation_speed % self.num_frames
+        image_index = frame * (vx != 0) + (vx > 0) * self.num_frames
+        images = self.images
+        return surface.blits([(images[i], (sx, sy)) for i, sx, sy in
+                              zip(image_index.tolist(), screen_x[visible].tolist(), screen_y[visible].tolist())])
@@ -0,0 +1,382 @@
+"""
+Tile-based levels.
+
+A level is a text file with one line per row of tiles and one character per
+tile, drawn from the swamp tiles in images/Tiles:
+
+    .   empty               =   ground top        #   earth
+    (   ground top-left     )   ground top-right  [   earth, left edge
+    ]   earth, right edge   <   platform left     -   platform
+    >   platform right      ~   water (not solid)
+
+    P   player spawn        E   enemy spawn       (both on an empty tile)
+
+The map is cut into chunks of CHUNK_TILES x CHUNK_TILES tiles. Chunks are
+fetched from the level's source only when something needs them, kept in a
+least-recently-used cache and rendered into their own surface the first time
+they come into view. Only the chunks overlapping the viewport are blitted, so
+drawing costs the same however large the level is, and the cache keeps
+memory bounded by the viewport rather than the level (see levelpack.py for
+levels streamed from disk). Collision only looks at the tiles next to the
+moving rect.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from assets import load_sprite
+
+TILE_SIZE = 64  # World pixels per tile (the 32 pixel tiles are scaled 2x, like the sprites)
+CHUNK_TILES = 8  # Tiles per chunk side
+MIN_CHUNKS = 16  # Chunks kept in memory before any viewport is known
+
+# Level file character -> tile number in images/Tiles (0 is empty)
+LEGEND = {
+    '.': 0,
+    '(': 1, '=': 2, ')': 3,
+    '[': 11, '#': 12, ']': 13,
+    '<': 7, '-': 8, '>': 9,
+    '~': 10,
+}
+PASSABLE = [0, 10]  # Tiles that don't block movement
+SPAWNS = {'P': 'player', 'E': 'enemy'}  # Level file character -> kind of entity starting there
+
+
+def tile_path(number):
+    return f'images/Tiles/Tile_{number:02d}.png'
+
+
+def tile_entries(tile_size=TILE_SIZE):
+    """
+    Return an asset entry (see loader.py) for every tile image a level can use.
+    """
+    return [{'kind': 'sprite', 'path': tile_path(number), 'scale_factor': tile_size // 32}
+            for number in sorted(set(LEGEND.values())) if number]
+
+
+class TileGrid:
+    """
+    Chunk source for a level held in memory as one array.
+    """
+    def __init__(self, tiles, chunk_tiles=CHUNK_TILES, spawns=()):
+        """
+        Args:
+            tiles: 2D array of tile numbers, one row per tile row (0 is empty).
+            chunk_tiles (int): Tiles per chunk side (default is CHUNK_TILES).
+            spawns: (kind, column, row) of every entity spawn.
+        """
+        self.tiles = np.asarray(tiles, dtype=np.uint8)
+        if self.tiles.ndim != 2 or not self.tiles.size:
+            raise ValueError("tiles must be a non-empty 2D array")
+        self.rows, self.columns = self.tiles.shape
+        self.chunk_tiles = chunk_tiles
+        self.spawns = list(spawns)
+
+    def chunk(self, column, row):
+        """
+        Return the tiles of one chunk as a CHUNK_TILES x CHUNK_TILES array, or None if it is empty.
+        Chunks on the map's right and bottom edges are padded with empty tiles.
+        """
+        n = self.chunk_tiles
+        block = self.tiles[row * n:(row + 1) * n, column * n:(column + 1) * n]
+        if not block.any():
+            return None
+        if block.shape != (n, n):
+            block = np.pad(block, ((0, n - block.shape[0]), (0, n - block.shape[1])))
+        return block
+
+
+def read_level(path, chunk_tiles=CHUNK_TILES):
+    """
+    Read a text level (see the module docstring for the format).
+    Short lines are padded with empty tiles.
+    Returns:
+        TileGrid of the level.
+    """
+    with open(path) as f:
+        lines = [line.rstrip('\n') for line in f]
+    while lines and not lines[-1]:
+        lines.pop()
+    width = max((len(line) for line in lines), default=0)
+    tiles = np.zeros((len(lines), width), dtype=np.uint8)
+    spawns = []
+    for row, line in enumerate(lines):
+        for column, char in enumerate(line):
+            if char in SPAWNS:
+                spawns.append((SPAWNS[char], column, row))
+            elif char in LEGEND:
+                tiles[row, column] = LEGEND[char]
+            else:
+                raise ValueError(f"{path}:{row + 1}:{column + 1}: unknown tile {char!r}")
+    return TileGrid(tiles, chunk_tiles, spawns)
+
+
+class Chunk:
+    """
+    A chunk's tiles, which of them are solid, and its rendered surface once it has been drawn.
+    """
+    __slots__ = ('tiles', 'solid', 'surface')
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.solid = ~np.isin(tiles, PASSABLE)
+        self.surface = None
+
+
+class TileMap:
+    """
+    Grid of tiles with chunked, cached rendering and tile collision.
+    Outside the map, the left, right and bottom edges count as solid.
+    """
+    def __init__(self, source, tile_size=TILE_SIZE, max_chunks=None):
+        """
+        Args:
+            source: Where the chunks come from: a TileGrid, or a LevelPack streamed from disk.
+            tile_size (int): World pixels per tile (default is TILE_SIZE).
+            max_chunks (int): Chunks kept in memory (default is twice what the viewport needs, see stream()).
+        """
+        self.source = source
+        self.rows, self.columns = source.rows, source.columns
+        self.tile_size = tile_size
+        self.chunk_tiles = source.chunk_tiles
+        self.rect = pygame.Rect(0, 0, self.columns * tile_size, self.rows * tile_size)
+        self.fixed_budget = max_chunks is not None
+        self.max_chunks = max_chunks or MIN_CHUNKS
+        self.chunks = OrderedDict()  # (column, row) -> Chunk, or None if empty; least recently used first
+        self.chunks_loaded = 0  # Chunks fetched from the source so far, for measuring
+        self.chunks_drawn = 0  # Chunks blitted by the last draw, for measuring
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Read a text level into memory (see levelpack.load_level for streaming large levels).
+        """
+        return cls(read_level(path), **kwargs)
+
+    def spawns(self, kind):
+        """
+        Return the world (x, bottom) of every spawn of a kind: the middle of the tile's floor.
+        """
+        size = self.tile_size
+        return [(column * size + size // 2, (row + 1) * size)
+                for spawn_kind, column, row in self.source.spawns if spawn_kind == kind]
+
+    def chunk(self, column, row):
+        """
+        Return a chunk, fetching it from the source on first use and evicting the least recently used
+        chunk when over budget.
+        Returns:
+            Chunk, or None if the chunk has no tiles.
+        """
+        key = (column, row)
+        if key in self.chunks:
+            self.chunks.move_to_end(key)
+            return self.chunks[key]
+        tiles = self.source.chunk(column, row)
+        chunk = Chunk(tiles) if tiles is not None else None
+        self.chunks[key] = chunk
+        self.chunks_loaded += 1
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    def _blocked(self, row0, row1, column0, column1):
+        """
+        Whether any tile in the inclusive block of rows and columns is solid.
+        """
+        if column0 < 0 or column1 >= self.columns or row1 >= self.rows:
+            return True
+        if row1 < 0:
+            return False  # Above the map
+        row0 = max(row0, 0)
+        n = self.chunk_tiles
+        for chunk_row in range(row0 // n, row1 // n + 1):
+            top = chunk_row * n
+            for chunk_column in range(column0 // n, column1 // n + 1):
+                chunk = self.chunk(chunk_column, chunk_row)
+                if chunk is None:
+                    continue
+                left = chunk_column * n
+                if chunk.solid[max(row0 - top, 0):row1 - top + 1, max(column0 - left, 0):column1 - left + 1].any():
+                    return True
+        return False
+
+    def first_solid(self, points):
+        """
+        Find the first point of a path that lies in a solid tile, e.g. where a shot hits the level.
+        Points outside the map never count as solid, so shots can fly off it.
+        Args:
+            points: (K, 2) array of world [x, y].
+        Returns:
+            Index of the first point in a solid tile, or None.
+        """
+        cells = np.floor(np.asarray(points) / self.tile_size).astype(np.int64)  # [column, row] of every point
+        columns, rows = cells[:, 0], cells[:, 1]
+        column0, column1, row0, row1 = int(columns.min()), int(columns.max()), int(rows.min()), int(rows.max())
+        if column0 >= self.columns or column1 < 0 or row0 >= self.rows or row1 < 0:
+            return None
+
+        # Solid tiles under the path's bounding box, stitched together from the chunks it covers
+        column0, row0 = max(column0, 0), max(row0, 0)
+        column1, row1 = min(column1, self.columns - 1), min(row1, self.rows - 1)
+        solid = np.zeros((row1 - row0 + 1, column1 - column0 + 1), dtype=bool)
+        n = self.chunk_tiles
+        for chunk_row in range(row0 // n, row1 // n + 1):
+            top = chunk_row * n
+            for chunk_column in range(column0 // n, column1 // n + 1):
+                chunk = self.chunk(chunk_column, chunk_row)
+                if chunk is None:
+                    continue
+                left = chunk_column * n
+                inner_rows = slice(max(row0 - top, 0), min(row1 - top + 1, n))
+                inner_columns = slice(max(column0 - left, 0), min(column1 - left + 1, n))
+                solid[top + inner_rows.start - row0:top + inner_rows.stop - row0,
+                      left + inner_columns.start - column0:left + inner_columns.stop - column0] = \
+                    chunk.solid[inner_rows, inner_columns]
+        if not solid.any():
+            return None
+
+        # Only now look at the points one by one; those outside the map are pushed off the box
+        columns, rows = columns - column0, rows - row0
+        outside = (columns < 0) | (columns >= solid.shape[1]) | (rows < 0) | (rows >= solid.shape[0])
+        hit = np.flatnonzero(solid[np.where(outside, 0, rows), np.where(outside, 0, columns)] & ~outside)
+        return int(hit[0]) if len(hit) else None
+
+    def move(self, rect, dx, dy):
+        """
+        Move a rect through the map, stopping it at solid tiles.
+        Each axis is swept tile by tile, so fast movers can't pass through thin ground.
+        Args:
+            rect (pygame.Rect): The body to move.
+            dx (int): Horizontal distance.
+            dy (int): Vertical distance (positive is down).
+        Returns:
+            (rect, on_ground, blocked): the moved rect, whether it stands on solid ground,
+            and whether it was stopped horizontally.
+        """
+        size = self.tile_size
+        rect = pygame.Rect(rect)
+        dx, dy = int(dx), int(dy)
+
+        blocked = False
+        rows = (rect.top // size, (rect.bottom - 1) // size)
+        if dx > 0:
+            for column in range(rect.right // size, (rect.right + dx - 1) // size + 1):
+                if self._blocked(*rows, column, column):
+                    dx, blocked = column * size - rect.right, True
+                    break
+        elif dx < 0:
+            for column in range((rect.left - 1) // size, (rect.left + dx) // size - 1, -1):
+                if self._blocked(*rows, column, column):
+                    dx, blocked = (column + 1) * size - rect.left, True
+                    break
+        rect.x += dx
+
+        columns = (rect.left // size, (rect.right - 1) // size)
+        if dy > 0:
+            for row in range(rect.bottom // size, (rect.bottom + dy - 1) // size + 1):
+                if self._blocked(row, row, *columns):
+                    dy = row * size - rect.bottom
+                    break
+        elif dy < 0:
+            for row in range((rect.top - 1) // size, (rect.top + dy) // size - 1, -1):
+                if self._blocked(row, row, *columns):
+                    dy = (row + 1) * size - rect.top
+                    break
+        rect.y += dy
+
+        # Standing on something if the pixel row under the feet is solid
+        on_ground = rect.bottom % size == 0 and self._blocked(rect.bottom // size, rect.bottom // size, *columns)
+        return rect, on_ground, blocked
+
+    def walkway(self, rect, left, right):
+        """
+        Find how far a rect standing on the ground can walk without hitting a wall or walking off an edge.
+        Only the tiles between left and right are looked at.
+        Args:
+            rect (pygame.Rect): A body standing on the ground (see move).
+            left (int): Leftmost x to look at.
+            right (int): Rightmost x to look at.
+        Returns:
+            (left, right): the range of rect.x that keeps the whole rect on its floor.
+        """
+        size = self.tile_size
+        rows = (rect.top // size, (rect.bottom - 1) // size)
+        floor = rect.bottom // size
+
+        def walkable(column):
+            return not self._blocked(*rows, column, column) and self._blocked(floor, floor, column, column)
+
+        column = rect.left // size
+        while column * size > left and walkable(column - 1):
+            column -= 1
+        lowest = max(column * size, left)
+
+        column = (rect.right - 1) // size
+        while (column + 1) * size < right + rect.width and walkable(column + 1):
+            column += 1
+        highest = min((column + 1) * size - rect.width, right)
+        return lowest, max(highest, lowest)
+
+    def render_chunk(self, chunk):
+        """
+        Draw a chunk's tiles onto a new transparent surface.
+        """
+        size = self.tile_size
+        n = self.chunk_tiles
+        surface = pygame.Surface((n * size, n * size), pygame.SRCALPHA).convert_alpha()
+        surface.blits([(load_sprite(tile_path(number), size // 32), (x * size, y * size))
+                       for (y, x), number in np.ndenumerate(chunk.tiles) if number], doreturn=False)
+        return surface
+
+    def _chunk_range(self, camera, view_size, margin=0):
+        """
+        Return the inclusive (column0, column1, row0, row1) of the chunks within margin chunks of the view.
+        """
+        span = self.chunk_tiles * self.tile_size
+        left, top = -camera.camera.x, -camera.camera.y  # World position of the screen's top left
+        view_width, view_height = view_size
+        return (max(left // span - margin, 0),
+                min((left + view_width - 1) // span + margin, (self.columns - 1) // self.chunk_tiles),
+                max(top // span - margin, 0),
+                min((top + view_height - 1) // span + margin, (self.rows - 1) // self.chunk_tiles))
+
+    def stream(self, camera, view_size, margin=1):
+        """
+        Get the chunks around the view ready before they scroll in, so drawing them doesn't stall.
+        Call after Camera.update. Unless a budget was given, the cache keeps twice the chunks
+        of this window, which bounds memory by the viewport size.
+        Args:
+            camera (Camera): The camera that was just moved.
+            view_size (tuple): Size of the screen.
+            margin (int): Chunks to prepare beyond each edge of the view (default is 1).
+        """
+        column0, column1, row0, row1 = self._chunk_range(camera, view_size, margin)
+        if not self.fixed_budget:
+            window = (column1 - column0 + 1) * (row1 - row0 + 1)
+            self.max_chunks = max(self.max_chunks, 2 * window)
+        for row in range(row0, row1 + 1):
+            for column in range(column0, column1 + 1):
+                chunk = self.chunk(column, row)
+                if chunk is not None and chunk.surface is None:
+                    chunk.surface = self.render_chunk(chunk)
+
+    def draw(self, surface, camera):
+        """
+        Draw the chunks that overlap the camera's view.
+        """
+        span = self.chunk_tiles * self.tile_size
+        column0, column1, row0, row1 = self._chunk_range(camera, surface.get_size())
+
+        blits = []
+        for row in range(row0, row1 + 1):
+            for column in range(column0, column1 + 1):
+                chunk = self.chunk(column, row)
+                if chunk is None:
+                    continue
+                if chunk.surface is None:
+                    chunk.surface = self.render_chunk(chunk)
+                blits.append((chunk.surface, (column * span + camera.camera.x, row * span + camera.camera.y)))
+        surface.blits(blits, doreturn=False)
+        self.chunks_drawn = len(blits)
@@ -0,0 +1,99 @@
+import pygame
+
+TRAIL_TOLERANCE = 0.5  # Pixels a freshly fired trail may be off its exact path when simplified
+
+# Levels of detail: a trail at least this opaque is drawn at this multiple of the tolerance.
+# Fainter, older trails are drawn from fewer points; nobody can tell them apart.
+TRAIL_LOD = (
+    (200, 1),  # Blue and white
+    (50, 3),  # Yellow
+    (0, 8),  # Red
+)
+
+
+def trail_color(elapsed_time):
+    """
+    Fade a trail out over time: blue, then white, yellow, red and finally transparent.
+    Args:
+        elapsed_time (float): Seconds since the shot was fired.
+    Returns:
+        RGBA tuple for the trail.
+    """
+    if elapsed_time >= 0.4:
+        return (0, 0, 0, 0)  # Transparent
+    elif elapsed_time >= 0.25:
+        return (255, 0, 0, 25)
+    elif elapsed_time >= 0.1:
+        return (255, 255, 0, 50)
+    elif elapsed_time >= 0.05:
+        return (255, 255, 255, 200)
+    else:
+        return (0, 0, 255, 255)  # Blue color for the graph
+
+
+def trail_tolerance(color, tolerance=TRAIL_TOLERANCE):
+    """
+    Pick how far a trail may be simplified from its fade color (see trail_color and TRAIL_LOD).
+    Args:
+        color (tuple): RGBA color the trail is drawn in.
+        tolerance (float): Pixel tolerance of the most detailed level (default is TRAIL_TOLERANCE).
+    Returns:
+        Pixel tolerance to pass to ShapeCache.simplified.
+    """
+    alpha = color[3] if len(color) == 4 else 255
+    for opacity, factor in TRAIL_LOD:
+        if alpha >= opacity:
+            return tolerance * factor
+    return tolerance * TRAIL_LOD[-1][1]
+
+
+class TrailRenderer:
+    """
+    Draw every trail of a frame onto one persistent transparent overlay,
+    then blend the overlay onto the screen once.
+    Only the area touched in the previous frame is cleared, and only the area
+    touched in this frame is blended.
+    """
+    def __init__(self, size):
+        self.overlay = pygame.Surface(size, pygame.SRCALPHA)
+        self.dirty = None  # Area of the overlay drawn on since the last clear
+        self.pixels_blended = 0  # Pixels blended by the last blit, for measuring
+
+    def begin(self):
+        """
+        Clear what was drawn in the previous frame.
+        """
+        if self.dirty is not None:
+            self.overlay.fill((0, 0, 0, 0), self.dirty)
+            self.dirty = None
+
+    def draw(self, points, color, width=2):
+        """
+        Draw one trail onto the overlay. Fully transparent trails are skipped.
+        Lines replace the overlay's pixels rather than blend with them, so draw
+        the oldest trails first and let the newer, more opaque ones cover them.
+        Args:
+            points: Sequence of at least two screen [x, y] points.
+            color (tuple): RGBA color of the trail.
+            width (int): Line width (default is 2).
+        """
+        if len(color) == 4 and color[3] == 0:
+            return
+        if len(points) < 2:
+            return
+        rect = pygame.draw.lines(self.overlay, color, False, points, width)
+        self.dirty = rect if self.dirty is None else self.dirty.union(rect)
+
+    def blit(self, surface):
+        """
+        Blend this frame's trails onto the surface in one blit.
+        Returns:
+            The area blended, or None if there was nothing to draw.
+        """
+        if self.dirty is None:
+            self.pixels_blended = 0
+            return None
+        self.dirty = self.dirty.clip(self.overlay.get_rect())
+        surface.blit(self.overlay, self.dirty.topleft, self.dirty)
+        self.pixels_blended = self.dirty.width * self.dirty.height
+        return self.dirty
@@ -0,0 +1,321 @@
+import ast
+import math
+import operator
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+SAMPLES = 1000  # Number of x samples per trajectory (one per pixel)
+Y_LIMIT = 1e6  # Largest y kept; poles (1/x at 0) and overflow are clipped to it
+
+# Functions an equation may call, mapped to their NumPy equivalents
+FUNCTIONS = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'atan2': np.arctan2,
+    'sinh': np.sinh,
+    'cosh': np.cosh,
+    'tanh': np.tanh,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'pow': np.float_power,  # Float math like math.pow, not wrapping int64 powers
+    'hypot': np.hypot,
+    'fabs': np.abs,
+    'abs': np.abs,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'degrees': np.degrees,
+    'radians': np.radians,
+}
+
+CONSTANTS = {
+    'pi': math.pi,
+    'e': math.e,
+    'tau': math.tau,
+}
+
+# Syntax an equation is allowed to use: arithmetic, calls and names only
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+
+# Integer arithmetic Python works out exactly, however big the numbers get
+INTEGER_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+MAX_INTEGER_BITS = 1024  # Integers past this are beyond a float anyway
+
+
+class Equation:
+    """
+    A parsed and compiled equation y = f(x), evaluated over a whole array of x at once.
+    """
+    def __init__(self, text, code):
+        self.text = text
+        self.code = code
+
+    def evaluate(self, xs):
+        """
+        Evaluate the equation for every value in xs.
+        Args:
+            xs (ndarray): x samples.
+        Returns:
+            ndarray of y values, same shape as xs, within Y_LIMIT of 0.
+        Raises:
+            ValueError: If the equation can't be evaluated, or is undefined (NaN) at some x.
+        """
+        namespace = {'__builtins__': {}, 'x': xs}
+        namespace.update(FUNCTIONS)
+        namespace.update(CONSTANTS)
+        with np.errstate(all='ignore'):  # Infinities are clipped and NaNs reported below
+            try:
+                ys = eval(self.code, namespace)
+            except (ArithmeticError, TypeError) as err:
+                raise ValueError(f"cannot evaluate equation {self.text!r}: {err}")
+        # Equations that don't use x evaluate to a single number
+        ys = np.broadcast_to(np.asarray(ys, dtype=float), xs.shape)
+        undefined = np.isnan(ys)
+        if undefined.any():
+            raise ValueError(f"equation {self.text!r} is undefined at x={np.broadcast_to(xs, ys.shape)[undefined][0]:g}")
+        return np.clip(ys, -Y_LIMIT, Y_LIMIT)
+
+
+def _expression_node(text):
+    """
+    Return the expression part of an equation string.
+    Accepts a bare expression ("sin(50*x)*50") or the legacy assignment form ("d[0]=sin(50*x)*50").
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='exec')
+    except SyntaxError as err:
+        raise ValueError(f"invalid equation {text!r}: {err.msg}")
+
+    if len(tree.body) != 1:
+        raise ValueError(f"equation must be a single expression: {text!r}")
+
+    statement = tree.body[0]
+    if isinstance(statement, ast.Expr):
+        return statement.value
+    if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Subscript)
+            and isinstance(statement.targets[0].value, ast.Name)
+            and statement.targets[0].value.id == 'd'):
+        return statement.value
+    raise ValueError(f"equation must be an expression or 'd[0]=<expression>': {text!r}")
+
+
+def _check(node, text):
+    """
+    Reject anything that isn't plain arithmetic over x, whitelisted functions and constants.
+    """
+    for child in ast.walk(node):
+        if not isinstance(child, ALLOWED_NODES):
+            raise ValueError(f"unsupported syntax {type(child).__name__} in equation {text!r}")
+        if isinstance(child, ast.Name) and child.id != 'x' and child.id not in FUNCTIONS and child.id not in CONSTANTS:
+            raise ValueError(f"unknown name {child.id!r} in equation {text!r}")
+        if isinstance(child, ast.Call):
+            if not isinstance(child.func, ast.Name) or child.func.id not in FUNCTIONS or child.keywords:
+                raise ValueError(f"unsupported call in equation {text!r}")
+        if isinstance(child, ast.Constant) and not isinstance(child.value, (int, float)):
+            raise ValueError(f"only numeric constants are allowed in equation {text!r}")
+
+
+def _integer_value(node, text):
+    """
+    Work out the integer constant arithmetic of an equation, rejecting numbers too big for a float.
+    Python computes int ** int exactly, so something like 9**9**9 would never finish evaluating.
+    Returns:
+        The int a node evaluates to, or None if it isn't integer constants only.
+    """
+    if isinstance(node, ast.Constant):
+        return node.value if type(node.value) is int else None
+    if isinstance(node, ast.UnaryOp):
+        value = _integer_value(node.operand, text)
+        if value is None:
+            return None
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        left = _integer_value(node.left, text)
+        right = _integer_value(node.right, text)
+        calculate = INTEGER_OPERATORS.get(type(node.op))
+        if left is None or right is None or calculate is None:
+            return None
+        if isinstance(node.op, ast.Pow):
+            if right < 0:
+                return None  # A float
+            if abs(left) > 1 and (abs(left).bit_length() - 1) * right > MAX_INTEGER_BITS:
+                raise ValueError(f"power too large in equation {text!r}")
+        try:
+            value = calculate(left, right)
+        except ZeroDivisionError:
+            return None  # Left for evaluation to report
+        if abs(value).bit_length() > MAX_INTEGER_BITS:
+            raise ValueError(f"number too large in equation {text!r}")
+        return value
+    for child in ast.iter_child_nodes(node):
+        _integer_value(child, text)
+    return None
+
+
+@lru_cache(maxsize=128)
+def compile_equation(text):
+    """
+    Parse, validate and compile an equation string once.
+    Compiled equations are cached by their text.
+    Args:
+        text (str): Equation such as "sin(50*x)*50" or "d[0]=sin(50*x)*50".
+    Returns:
+        Equation ready to be evaluated over an array of x.
+    """
+    node = _expression_node(text)
+    _check(node, text)
+    _integer_value(node, text)
+    code = compile(ast.Expression(body=node), '<equation>', 'eval')
+    return Equation(text, code)
+
+
+def trajectory(text, x_start, y_offset, samples=SAMPLES):
+    """
+    Sample an equation over [x_start, x_start + samples) in one batch.
+    Screen y grows downwards, so the equation's y is flipped and moved by y_offset.
+    Args:
+        text (str): Equation string.
+        x_start (int): First x sample.
+        y_offset (int): Screen y of the equation's y = 0 line.
+        samples (int): Number of samples (default is SAMPLES).
+    Returns:
+        ndarray of shape (samples, 2) holding [x, y] points.
+    """
+    equation = compile_equation(text)
+    points = np.empty((samples, 2), dtype=float)
+    points[:, 0] = np.arange(x_start, x_start + samples)
+    points[:, 1] = y_offset - equation.evaluate(points[:, 0])
+    return points
+
+
+def simplify(points, tolerance):
+    """
+    Drop the points of a polyline that keep it within tolerance of the original.
+    Like Ramer-Douglas-Peucker, segments are split at points that are more than
+    tolerance away from them until none are. Every round splits all segments at
+    once, at every peak of that distance rather than only the farthest point, so
+    wavy paths take a handful of array passes instead of one pass per wave.
+    Args:
+        points: (N, 2) array of [x, y].
+        tolerance (float): Largest distance, in pixels, any dropped point may be from the simplified line.
+    Returns:
+        (M, 2) array of the points kept, in order; the first and last point are always kept.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n < 3:
+        return points.copy()
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    index = np.arange(n)
+    while True:
+        kept = np.flatnonzero(keep)
+        segment = np.minimum(np.searchsorted(kept, index, side='right') - 1, len(kept) - 2)  # Segment of every point
+        start, end = points[kept[segment]], points[kept[segment + 1]]
+
+        # Distance of every point to its segment (0 for the kept points)
+        direction = end - start
+        length2 = (direction ** 2).sum(axis=1)
+        t = np.clip(((points - start) * direction).sum(axis=1) / np.where(length2 > 0, length2, 1), 0, 1)
+        distance = np.hypot(*(points - start - direction * t[:, None]).T)
+
+        # Split at the points too far away that are farther than their neighbours (the first of a tie)
+        peak = np.zeros(n, dtype=bool)
+        peak[1:-1] = (distance[1:-1] > distance[:-2]) & (distance[1:-1] >= distance[2:])
+        split = peak & (distance > tolerance)
+        if not split.any():
+            return points[keep]
+        keep |= split
+
+
+class ShapeCache:
+    """
+    Least-recently-used cache of shot shapes.
+    A shape is an equation sampled relative to where the shot starts: row i
+    is [direction * i, -f(i)], so the same shape serves every shot of that
+    equation and direction, wherever it is fired from. Add the start point
+    on read to get world points.
+    """
+    def __init__(self, maxsize=32, samples=SAMPLES):
+        """
+        Args:
+            maxsize (int): Most shapes kept; the least recently used is dropped beyond that (default is 32).
+            samples (int): Samples per shape (default is SAMPLES).
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.samples = samples
+        self.shapes = OrderedDict()  # (equation text, direction) -> shape, least recently used first
+        self.outlines = {}  # (id(shape), tolerance) -> (shape, simplified shape) of the cached shapes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, direction=1):
+        """
+        Return the shape of an equation fired in a direction.
+        Args:
+            text (str): Equation string.
+            direction (int): 1 to fire to the right, -1 to the left.
+        Returns:
+            Read-only ndarray of shape (samples, 2) holding [x, y] relative to the shot's start.
+        """
+        key = (text, direction)
+        shape = self.shapes.get(key)
+        if shape is not None:
+            self.hits += 1
+            self.shapes.move_to_end(key)
+            return shape
+
+        self.misses += 1
+        shape = np.empty((self.samples, 2), dtype=float)
+        steps = np.arange(self.samples, dtype=float)
+        shape[:, 0] = direction * steps
+        shape[:, 1] = -compile_equation(text).evaluate(steps)
+        shape.setflags(write=False)  # Shared by every shot; nobody may change it
+        self.shapes[key] = shape
+        if len(self.shapes) > self.maxsize:
+            _, dropped = self.shapes.popitem(last=False)
+            for outline in [outline for outline in self.outlines if outline[0] == id(dropped)]:
+                del self.outlines[outline]
+        return shape
+
+    def simplified(self, shape, tolerance):
+        """
+        Return a shape from get() with only the points needed to stay within tolerance pixels of it,
+        for drawing (see simplify). Worked out once per shape and tolerance.
+        """
+        key = (id(shape), tolerance)
+        cached = self.outlines.get(key)
+        if cached is not None and cached[0] is shape:
+            return cached[1]
+        outline = simplify(shape, tolerance)
+        outline.setflags(write=False)
+        if any(cached is shape for cached in self.shapes.values()):  # Dropped shapes aren't kept around for it
+            self.outlines[key] = (shape, outline)
+        return outline
+
+    def stats(self):
+        return f"{self.hits} hits / {self.misses} misses"
+
+
+# Shapes of the shots fired in the game
+shot_shapes = ShapeCache()